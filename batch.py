@@ -0,0 +1,215 @@
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+import traceback
+
+import persistence
+import run
+from tracing import tracer
+
+_STOP = object()
+
+# 🚦 Limites por etapa: mantêm Replicate e CoinGecko dentro da cota
+STAGE_WORKERS = {
+    "data": int(os.getenv("BATCH_DATA_WORKERS", "2")),
+    "answer": int(os.getenv("BATCH_ANSWER_WORKERS", "2")),
+    "audio": int(os.getenv("BATCH_AUDIO_WORKERS", "2")),
+    "upload": int(os.getenv("BATCH_UPLOAD_WORKERS", "2")),
+    "video": int(os.getenv("BATCH_VIDEO_WORKERS", "1")),
+}
+STAGE_QUEUE_SIZE = int(os.getenv("BATCH_QUEUE_SIZE", "4"))
+
+
+def stage_data(item):
+    item["coin_data"] = run.get_data(item["question"])
+    if not item["coin_data"]:
+        item["error"] = "Couldn't get data from CoinGecko"
+
+
+def stage_answer(item):
+    answer = run.query_deepseek_stream(run.build_final_prompt(item["question"], item.pop("coin_data")))
+    if not answer:
+        item["error"] = "Empty answer from DeepSeek"
+        return
+    item["answer"] = answer
+    item["answer_clean"] = run.remove_emojis(answer)
+
+
+def stage_audio(item):
+    item["audio_path"] = run.save_audio_from_replicate(item.pop("answer_clean"))
+    if not item["audio_path"]:
+        item["error"] = "Failed to generate audio"
+
+
+def stage_upload(item):
+    item["audio_digest"] = run.file_digest(item["audio_path"])
+    item["audio_url"] = run.upload_to_cloudinary(item["audio_path"], item["audio_digest"])
+    if not item["audio_url"]:
+        item["error"] = "Failed to upload audio to Cloudinary"
+
+
+def stage_video(item):
+    item["video_path"] = run.generate_video_with_avatar(item["audio_url"], item["audio_digest"])
+    if not item["video_path"]:
+        item["error"] = "Failed to generate video"
+
+
+STAGES = [
+    ("data", stage_data),
+    ("answer", stage_answer),
+    ("audio", stage_audio),
+    ("upload", stage_upload),
+    ("video", stage_video),
+]
+
+
+class Stage:
+    def __init__(self, name, fn, workers, queue_size):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.next = None
+        self.done = None
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                return
+
+            try:
+                with persistence.activate(item["consulta"]), persistence.stage(self.name):
+                    self.fn(item)
+            except Exception as e:
+                item["error"] = f"{self.name}: {e}"
+                traceback.print_exc()
+
+            # Fila limitada: put() bloqueia quando a próxima etapa está cheia (backpressure)
+            if item.get("error") or self.next is None:
+                self.done.put(item)
+            else:
+                self.next.queue.put(item)
+
+    def stop(self):
+        for _ in self._threads:
+            self.queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+
+
+def read_questions(path):
+    items = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            question = record.get("question") or record.get("pergunta") or record.get("body")
+            if not question:
+                print(f"⚠️ Skipping line {line_number}: no question field.")
+                continue
+            items.append({
+                "index": len(items),
+                "id": record.get("id") or record.get("request_id") or line_number,
+                "question": question.strip(),
+            })
+    return items
+
+
+def build_pipeline(skip_media=False):
+    stages = STAGES[:2] if skip_media else STAGES
+    pipeline = [Stage(name, fn, STAGE_WORKERS[name], STAGE_QUEUE_SIZE) for name, fn in stages]
+    done = queue.Queue()
+    for current, following in zip(pipeline, pipeline[1:] + [None]):
+        current.next = following
+        current.done = done
+    return pipeline, done
+
+
+def to_result(item):
+    result = {
+        "id": item["id"],
+        "question": item["question"],
+        "status": "error" if item.get("error") else "ok",
+    }
+    for field in ("answer", "audio_path", "audio_url", "video_path", "error", "timings", "total_time"):
+        if item.get(field) is not None:
+            result[field] = item[field]
+    return result
+
+
+def run_batch(input_path, output_path, skip_media=False):
+    items = read_questions(input_path)
+    if not items:
+        print("😕 No questions found.")
+        return 0
+
+    pipeline, done = build_pipeline(skip_media)
+    for stage in pipeline:
+        stage.start()
+
+    def feed():
+        for item in items:
+            item["consulta"] = persistence.start_consulta(item["question"])
+            pipeline[0].queue.put(item)
+
+    feeder = threading.Thread(target=feed, name="feeder", daemon=True)
+    feeder.start()
+
+    started = time.time()
+    pending = {}
+    next_index = 0
+    failures = 0
+    with open(output_path, "w", encoding="utf-8") as out:
+        for _ in range(len(items)):
+            item = done.get()
+            consulta = item.pop("consulta")
+            item["timings"] = dict(consulta.timings)
+            item["total_time"] = round(time.time() - consulta.started, 3)
+            persistence.finish_consulta(consulta, item.get("answer"))
+            pending[item["index"]] = item
+
+            # Resultados saem na mesma ordem da entrada
+            while next_index in pending:
+                result = to_result(pending.pop(next_index))
+                failures += result["status"] == "error"
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+                next_index += 1
+
+    feeder.join()
+    for stage in pipeline:
+        stage.stop()
+
+    elapsed = time.time() - started
+    print(f"\n✅ {len(items) - failures}/{len(items)} questions answered in {elapsed:.2f}s -> {output_path}")
+    print(f"\n📊 Stage latencies (s):\n{tracer.report()}")
+    print(f"💾 Trace saved to {tracer.export_json()}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of crypto questions through a concurrent pipeline.")
+    parser.add_argument("input", nargs="?", default="requests.jsonl")
+    parser.add_argument("output", nargs="?", default="results.jsonl")
+    parser.add_argument("--skip-media", action="store_true", help="stop after the text answer (no TTS, upload or video)")
+    args = parser.parse_args()
+
+    failures = run_batch(args.input, args.output, skip_media=args.skip_media)
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+from benchmarks.fakes import DEFAULT_LATENCIES, StubServer, install
+
+# 🧪 Mistura de perguntas que o roteador local resolve e outras que precisam do LLM
+QUESTIONS = [
+    "What is the price of bitcoin in usd?",
+    "Average price of ethereum over the last 90 days",
+    "Tell me something fun about dogecoin",
+    "What were the highs and lows of solana in the last 30 days?",
+    "How is the crypto market doing globally?",
+    "Should I buy some cardano today?",
+    "Bitcoin OHLC for the last 7 days",
+    "What is the price of ETH in euros?",
+]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def describe(latencies, elapsed, startup, text_latencies=None):
+    # No CLI e no batch o texto só aparece junto com o vídeo
+    text_latencies = text_latencies or latencies
+    return {
+        "questions": len(latencies),
+        "elapsed": round(elapsed, 3),
+        "startup": round(startup, 3),
+        "throughput_per_min": round(len(latencies) / elapsed * 60, 2),
+        "p50": round(percentile(latencies, 50), 3),
+        "p95": round(percentile(latencies, 95), 3),
+        "p99": round(percentile(latencies, 99), 3),
+        "text_p50": round(percentile(text_latencies, 50), 3),
+        "text_p95": round(percentile(text_latencies, 95), 3),
+    }
+
+
+def questions_for(count):
+    return [f"{QUESTIONS[i % len(QUESTIONS)]} (#{i})" for i in range(count)]
+
+
+def request_json(url, payload=None):
+    data = json.dumps(payload).encode() if payload is not None else None
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=600) as response:
+        return json.loads(response.read())
+
+
+def run_serial(questions):
+    started = time.time()
+    import run
+
+    startup = time.time() - started
+    latencies = []
+    started = time.time()
+    for question in questions:
+        question_started = time.time()
+        coin_data = run.get_data(question)
+        if coin_data:
+            _, audio_path = run.save_audio_streaming(run.build_final_prompt(question, coin_data))
+            if audio_path:
+                digest = run.file_digest(audio_path)
+                public_url = run.upload_to_cloudinary(audio_path, digest)
+                if public_url:
+                    run.generate_video_with_avatar(public_url, digest)
+        latencies.append(time.time() - question_started)
+    return describe(latencies, time.time() - started, startup)
+
+
+def run_batch(questions, workdir):
+    started = time.time()
+    import batch
+
+    startup = time.time() - started
+
+    input_path = os.path.join(workdir, "questions.jsonl")
+    output_path = os.path.join(workdir, "results.jsonl")
+    with open(input_path, "w", encoding="utf-8") as f:
+        for index, question in enumerate(questions):
+            f.write(json.dumps({"id": index, "question": question}) + "\n")
+
+    started = time.time()
+    batch.run_batch(input_path, output_path)
+    elapsed = time.time() - started
+    with open(output_path, "r", encoding="utf-8") as f:
+        latencies = [json.loads(line)["total_time"] for line in f]
+    return describe(latencies, elapsed, startup)
+
+
+def run_service(questions):
+    started = time.time()
+    import service
+
+    app = service.Service()
+    server = service.create_server(app, "127.0.0.1", 0)
+    startup = time.time() - started
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    threading.Thread(target=app.warm_up, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+
+    # Um cliente que pergunta em sequência: o vídeo de uma pergunta roda enquanto a próxima é respondida
+    text_latencies, pending = [], []
+    started = time.time()
+    for question in questions:
+        question_started = time.time()
+        response = request_json(f"{url}/ask", {"question": question})
+        text_latencies.append(time.time() - question_started)
+        pending.append((question_started, response["job_id"]))
+
+    latencies = []
+    for question_started, job_id in pending:
+        job = request_json(f"{url}/jobs/{job_id}?wait=600")
+        latencies.append(job["updated"] - question_started)
+    elapsed = time.time() - started
+    server.shutdown()
+    return describe(latencies, elapsed, startup, text_latencies)
+
+
+def run_mode(mode, count, latencies, seed):
+    random.seed(seed)
+    with StubServer(latencies) as stub:
+        workdir = install(latencies, stub.url)
+        from tracing import tracer
+
+        questions = questions_for(count)
+        if mode == "serial":
+            result = run_serial(questions)
+        elif mode == "batch":
+            result = run_batch(questions, workdir)
+        else:
+            result = run_service(questions)
+        result["stages"] = tracer.snapshot(include_spans=False)["histograms"]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline throughput/latency benchmark with fake Replicate, CoinGecko and Cloudinary.")
+    parser.add_argument("--mode", choices=["serial", "batch", "service", "all"], default="all")
+    parser.add_argument("--questions", type=int, default=8)
+    parser.add_argument("--scale", type=float, default=0.1, help="multiply every fake latency (1.0 = realistic)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default=None, help="write the JSON report here")
+    parser.add_argument("--json", action="store_true", help=argparse.SUPPRESS)
+    for name, seconds in DEFAULT_LATENCIES.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=float, default=seconds, dest=name)
+    args = parser.parse_args()
+
+    latencies = {name: getattr(args, name) * args.scale for name in DEFAULT_LATENCIES}
+
+    if args.mode != "all":
+        result = run_mode(args.mode, args.questions, latencies, args.seed)
+        if args.json:
+            print("__RESULT__" + json.dumps(result))
+            return
+        report = {"latencies": latencies, "modes": {args.mode: result}}
+    else:
+        # Cada modo roda num processo novo: caches, clientes e tracer começam do zero
+        report = {"latencies": latencies, "modes": {}}
+        for mode in ("serial", "batch", "service"):
+            command = [sys.executable, "-m", "benchmarks.pipeline", "--mode", mode, "--json",
+                       "--questions", str(args.questions), "--scale", "1", "--seed", str(args.seed)]
+            for name, seconds in latencies.items():
+                command += [f"--{name.replace('_', '-')}", str(seconds)]
+            output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+            report["modes"][mode] = json.loads(output.rsplit("__RESULT__", 1)[1])
+
+    print(f"\n{'mode':<8} {'questions':>9} {'startup':>8} {'elapsed':>8} {'q/min':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'text p50':>9}")
+    for mode, result in report["modes"].items():
+        print(f"{mode:<8} {result['questions']:>9} {result['startup']:>8.2f} {result['elapsed']:>8.2f} {result['throughput_per_min']:>8.1f} "
+              f"{result['p50']:>8.2f} {result['p95']:>8.2f} {result['p99']:>8.2f} {result['text_p50']:>9.2f}")
+
+    out = args.out or os.path.join(tempfile.gettempdir(), "repligecko-bench.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Report saved to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from price_store import DAY_MS, HOUR_MS, PriceStore, last_per_bucket, payload_to_columns
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "price_store", "bitcoin_usd_market_chart_range.json")
+
+
+def load_fixture():
+    with open(FIXTURE_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class FixtureFetcher:
+    # Faz o papel da /market_chart/range: corta a fixture no intervalo pedido e conta as chamadas
+    def __init__(self, payload):
+        self.payload = payload
+        self.calls = []
+
+    def __call__(self, coin, vs_currency, start, end):
+        self.calls.append((start, end))
+        return {
+            name: [[t, v] for t, v in points if start * 1000 <= t <= end * 1000]
+            for name, points in self.payload.items()
+        }
+
+
+def expected(payload, start, end):
+    columns = payload_to_columns(payload)
+    inside = (columns["ts"] >= start * 1000) & (columns["ts"] <= end * 1000)
+    columns = {name: values[inside] for name, values in columns.items()}
+    return last_per_bucket(columns, HOUR_MS) if end - start > 86400 else columns
+
+
+def check(condition, message):
+    if not condition:
+        raise AssertionError(message)
+    print(f"✅ {message}")
+
+
+def run_checks(root):
+    payload = load_fixture()
+    end = payload["prices"][-1][0] // 1000
+    day = DAY_MS // 1000
+
+    fetcher = FixtureFetcher(payload)
+    store = PriceStore(fetcher, root=os.path.join(root, "main"))
+
+    # Primeira consulta: um pedaço só, direto da "API"
+    result = store.query("bitcoin", "usd", end - 7 * day, end - 3 * day)
+    check(fetcher.calls == [(end - 7 * day, end - 3 * day)], "first query fetches exactly the requested range")
+    check([t for t, _ in result["prices"]] == expected(payload, end - 7 * day, end - 3 * day)["ts"].tolist(),
+          "read slices the stored range by timestamp")
+
+    # Começo anterior ao que já está em disco: busca só o pedaço novo e regrava em ordem
+    fetcher.calls.clear()
+    result = store.query("bitcoin", "usd", end - 10 * day, end - 3 * day)
+    check(fetcher.calls == [(end - 10 * day, end - 7 * day)], "head merge fetches only the missing head")
+    ts = [t for t, _ in result["prices"]]
+    check(ts == sorted(set(ts)) and ts == expected(payload, end - 10 * day, end - 3 * day)["ts"].tolist(),
+          "merged series stays sorted and unique")
+
+    # Final mais novo: só a cauda vem da API e é anexada
+    fetcher.calls.clear()
+    store.query("bitcoin", "usd", end - 10 * day, end)
+    check(fetcher.calls == [(end - 3 * day, end)], "tail append fetches only the missing tail")
+
+    fetcher.calls.clear()
+    store.query("bitcoin", "usd", end - 9 * day, end - day)
+    check(not fetcher.calls, "a covered range is served from disk")
+
+    # Consultas disjuntas não buscam o buraco entre elas
+    disjoint = FixtureFetcher(payload)
+    other = PriceStore(disjoint, root=os.path.join(root, "disjoint"))
+    other.query("bitcoin", "usd", end - 14 * day, end - 13 * day)
+    other.query("bitcoin", "usd", end - 2 * day, end)
+    check(disjoint.calls == [(end - 14 * day, end - 13 * day), (end - 2 * day, end)],
+          "disjoint queries leave the gap between them alone")
+    other.query("bitcoin", "usd", end - 13 * day - 3600, end - 2 * day + 3600)
+    check(disjoint.calls[-1] == (end - 13 * day, end - 2 * day), "a later query fills just the gap")
+
+    # Compactação: fora das últimas 24h, um ponto por hora
+    series = store.series("bitcoin", "usd")
+    before = len(series)
+    removed = series.compact(now_ms=end * 1000)
+    after = series.read(0, end * 1000)
+    old = after["ts"] < (end - day) * 1000
+    check(removed > 0 and len(series) == before - removed, f"compact drops {removed} raw rows")
+    check(len(np.unique(after["ts"][old] // HOUR_MS)) == int(old.sum()), "compacted history keeps one row per hour")
+    check(np.array_equal(after["ts"][~old], expected(payload, end - day, end)["ts"]), "the last 24h stay raw")
+
+    # Pontos na borda entre dois pedaços da API não podem ser gravados duas vezes
+    chunked = PriceStore(FixtureFetcher(payload), root=os.path.join(root, "chunked"), chunk_seconds=3 * day)
+    chunked.query("bitcoin", "usd", end - 14 * day, end)
+    stored = chunked.series("bitcoin", "usd").read(0, end * 1000)["ts"]
+    check(len(chunked.fetch_range.calls) == 5 and len(stored) == len(np.unique(stored)),
+          "chunk boundaries do not duplicate rows")
+
+    # Compactação automática depois de muitas linhas novas
+    auto = PriceStore(FixtureFetcher(payload), root=os.path.join(root, "auto"), compact_after_rows=100)
+    auto.query("bitcoin", "usd", end - 14 * day, end)
+    check(auto.series("bitcoin", "usd").meta["compacted_rows"] == len(auto.series("bitcoin", "usd")),
+          "backfill compacts once the row threshold is crossed")
+
+
+def main():
+    with tempfile.TemporaryDirectory(prefix="price-store-check-") as root:
+        run_checks(root)
+    print("\n🎉 Price store checks passed (offline, no network).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import argparse
+import glob
+import json
+import os
+import time
+
+import numpy as np
+
+from summarize import summarize_payload
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# 🎯 Casos gravados com --record (pergunta, endpoint)
+CASES = [
+    ("What was the average price of bitcoin over the last 365 days?", "/coins/bitcoin/market_chart?vs_currency=usd&days=365"),
+    ("How volatile was ethereum in the last 90 days?", "/coins/ethereum/market_chart?vs_currency=usd&days=90"),
+    ("What were the highs and lows of solana this week?", "/coins/solana/market_chart?vs_currency=usd&days=7"),
+    ("Show me the bitcoin OHLC trend for the last 30 days", "/coins/bitcoin/ohlc?vs_currency=usd&days=30"),
+    ("What are the top coins right now?", "/coins/markets?vs_currency=usd"),
+    ("What is the price of bitcoin?", "/simple/price?ids=bitcoin&vs_currencies=usd"),
+]
+
+
+def save_fixtures(fixtures):
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    for index, fixture in enumerate(fixtures):
+        path = os.path.join(FIXTURES_DIR, f"{index:02d}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(fixture, f, separators=(",", ":"))
+        print(f"💾 {fixture['endpoint']} -> {path}")
+
+
+def record(api_key):
+    from coingecko import CoinGeckoClient
+
+    client = CoinGeckoClient(api_key)
+    save_fixtures([
+        {"question": question, "endpoint": endpoint, "data": client.get(endpoint)}
+        for question, endpoint in CASES
+    ])
+
+
+def synthetic_fixtures(seed=42):
+    # Passeio aleatório com a mesma forma das respostas reais, para rodar sem chave de API
+    rng = np.random.default_rng(seed)
+    now = 1_700_000_000_000
+
+    def walk(points, step_ms, start):
+        timestamps = now - step_ms * np.arange(points)[::-1]
+        values = start * np.exp(np.cumsum(rng.normal(0, 0.01, points)))
+        return [[int(t), round(float(v), 2)] for t, v in zip(timestamps, values)]
+
+    def chart(points, step_ms, start):
+        prices = walk(points, step_ms, start)
+        return {
+            "prices": prices,
+            "market_caps": [[t, round(v * 19_500_000)] for t, v in prices],
+            "total_volumes": [[t, round(v * 400_000)] for t, v in prices],
+        }
+
+    ohlc = [[t, v, round(v * 1.01, 2), round(v * 0.99, 2), round(v * 1.002, 2)] for t, v in walk(180, 4 * 3_600_000, 60_000)]
+    caps = np.sort(rng.lognormal(21, 2, 100))[::-1]
+    markets = [
+        {
+            "id": f"coin-{rank}", "symbol": f"c{rank}", "name": f"Coin {rank}", "image": f"https://assets.coingecko.com/coins/images/{rank}/large/coin.png",
+            "current_price": round(float(cap / 1e7), 4), "market_cap": round(float(cap)), "market_cap_rank": rank,
+            "fully_diluted_valuation": round(float(cap * 1.2)), "total_volume": round(float(cap * 0.05)),
+            "high_24h": round(float(cap / 1e7 * 1.03), 4), "low_24h": round(float(cap / 1e7 * 0.97), 4),
+            "price_change_24h": round(float(cap / 1e7 * 0.01), 4), "price_change_percentage_24h": 1.0,
+            "market_cap_change_24h": round(float(cap * 0.01)), "market_cap_change_percentage_24h": 1.0,
+            "circulating_supply": 1e7, "total_supply": 1.2e7, "max_supply": None, "ath": round(float(cap / 5e6), 4),
+            "ath_change_percentage": -50.0, "ath_date": "2024-03-14T07:10:36.635Z", "atl": 0.01,
+            "atl_change_percentage": 1e5, "atl_date": "2015-10-20T00:00:00.000Z", "roi": None,
+            "last_updated": "2024-11-05T12:00:00.000Z",
+        }
+        for rank, cap in enumerate(caps, start=1)
+    ]
+    return [
+        {"question": CASES[0][0], "endpoint": CASES[0][1], "data": chart(366, 86_400_000, 40_000)},
+        {"question": CASES[1][0], "endpoint": CASES[1][1], "data": chart(2160, 3_600_000, 3_000)},
+        {"question": CASES[2][0], "endpoint": CASES[2][1], "data": chart(168, 3_600_000, 150)},
+        {"question": CASES[3][0], "endpoint": CASES[3][1], "data": ohlc},
+        {"question": CASES[4][0], "endpoint": CASES[4][1], "data": markets},
+        {"question": CASES[5][0], "endpoint": CASES[5][1], "data": {"bitcoin": {"usd": 65000.12}}},
+    ]
+
+
+def load_fixtures():
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.json"))):
+        with open(path, "r", encoding="utf-8") as f:
+            fixtures.append(json.load(f))
+    return fixtures
+
+
+def benchmark(fixtures, repeat=20):
+    rows = []
+    for fixture in fixtures:
+        raw = str(fixture["data"])
+        started = time.perf_counter()
+        for _ in range(repeat):
+            summary = summarize_payload(fixture["question"], fixture["data"])
+        elapsed_ms = (time.perf_counter() - started) * 1000 / repeat
+        rows.append((fixture["endpoint"], len(raw), len(summary), elapsed_ms))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare final-prompt payload size before and after summarization.")
+    parser.add_argument("--record", action="store_true", help="record fresh fixtures from the CoinGecko API first")
+    parser.add_argument("--synthetic", action="store_true", help="regenerate the committed fixtures from the synthetic generator")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.record:
+        record(os.getenv("coin_gecko_api"))
+    elif args.synthetic:
+        save_fixtures(synthetic_fixtures())
+
+    fixtures = load_fixtures()
+    if not fixtures:
+        print("ℹ️ No recorded fixtures found, using synthetic payloads (run with --record to capture real ones).\n")
+        fixtures = synthetic_fixtures()
+
+    rows = benchmark(fixtures, args.repeat)
+    print(f"{'endpoint':<60} {'raw chars':>10} {'summary':>8} {'~tokens before':>15} {'~tokens after':>14} {'saved':>7} {'ms':>7}")
+    total_raw = total_summary = 0
+    for endpoint, raw, summary, elapsed_ms in rows:
+        total_raw += raw
+        total_summary += summary
+        saved = 1 - summary / raw if raw else 0
+        print(f"{endpoint:<60} {raw:>10,} {summary:>8,} {raw // 4:>15,} {summary // 4:>14,} {saved:>7.1%} {elapsed_ms:>7.2f}")
+    print(f"\n📉 Total: {total_raw:,} -> {total_summary:,} chars ({1 - total_summary / total_raw:.1%} smaller)")
+
+
+if __name__ == "__main__":
+    main()
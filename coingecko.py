@@ -0,0 +1,174 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from rate_limit import TIER_LIMITS, SimplePriceBatcher, TokenBucket, backoff_delay, retry_after_seconds
+
+BASE_URL = "https://api.coingecko.com/api/v3"
+COINGECKO_CACHE_SIZE = int(os.getenv("COINGECKO_CACHE_SIZE", "256"))
+COINGECKO_TIMEOUT = float(os.getenv("COINGECKO_TIMEOUT", "15"))
+COINGECKO_TIER = os.getenv("COINGECKO_TIER", "demo")
+COINGECKO_MAX_RETRIES = int(os.getenv("COINGECKO_MAX_RETRIES", "3"))
+COINGECKO_BATCH_WINDOW = float(os.getenv("COINGECKO_BATCH_WINDOW", "0.05"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# ⏳ Tempo de vida (segundos) por família de endpoint; a primeira regra que casar vence
+TTL_RULES = [
+    (r"^/simple/price", 30),
+    (r"^/coins/markets", 60),
+    (r"^/global", 120),
+    (r"^/coins/[^/]+/market_chart/range", 3600),
+    (r"^/coins/[^/]+/market_chart", 300),
+    (r"^/coins/[^/]+/ohlc", 300),
+    (r"^/exchange_rates", 1800),
+]
+DEFAULT_TTL = 60
+
+
+class CoinGeckoClient:
+    def __init__(self, api_key, base_url=BASE_URL, max_entries=COINGECKO_CACHE_SIZE, timeout=COINGECKO_TIMEOUT, pool_size=10, session=None,
+                 rate_per_minute=None, max_retries=COINGECKO_MAX_RETRIES, batch_window=COINGECKO_BATCH_WINDOW, on_request=None):
+        self.base_url = base_url.rstrip("/")
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.on_request = on_request
+        self.bucket = TokenBucket(rate_per_minute or TIER_LIMITS.get(COINGECKO_TIER, TIER_LIMITS["demo"]))
+        self.batcher = SimplePriceBatcher(lambda params: self._fetch("/simple/price", params), window=batch_window) if batch_window else None
+
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "accept": "application/json",
+            "x-cg-demo-api-key": api_key,
+        })
+
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "retries": 0, "http_requests": 0}
+
+    def _split(self, endpoint):
+        if endpoint.startswith(self.base_url):
+            endpoint = endpoint[len(self.base_url):]
+        parts = urlsplit(endpoint)
+        params = sorted(parse_qsl(parts.query, keep_blank_values=True))
+        path = "/" + parts.path.lstrip("/")
+        return path, params
+
+    def ttl_for(self, path):
+        for pattern, ttl in TTL_RULES:
+            if re.search(pattern, path):
+                return ttl
+        return DEFAULT_TTL
+
+    def get(self, endpoint):
+        path, params = self._split(endpoint)
+        key = f"{path}?{urlencode(params)}" if params else path
+        now = time.monotonic()
+
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached and cached[0] > now:
+                self._cache.move_to_end(key)
+                self.counters["hits"] += 1
+                return cached[1]
+
+            future = self._inflight.get(key)
+            if future:
+                self.counters["coalesced"] += 1
+                leader = False
+            else:
+                future = Future()
+                self._inflight[key] = future
+                self.counters["misses"] += 1
+                leader = True
+
+        if not leader:
+            return future.result()
+
+        try:
+            data = self._batched_price(params) if path == "/simple/price" and self.batcher else None
+            if data is None:
+                data = self._fetch(path, params)
+        except BaseException as e:
+            future.set_exception(e)
+            with self._lock:
+                self._inflight.pop(key, None)
+            raise
+
+        with self._lock:
+            self._store(key, data, time.monotonic() + self.ttl_for(path))
+            self._inflight.pop(key, None)
+        future.set_result(data)
+        return data
+
+    def _batched_price(self, params):
+        # Só junta consultas "puras"; flags extras (include_market_cap etc.) mudam o formato da resposta
+        values = dict(params)
+        if set(values) != {"ids", "vs_currencies"} or len(params) != 2:
+            return None
+        ids = [coin.strip() for coin in values["ids"].split(",") if coin.strip()]
+        currencies = [currency.strip() for currency in values["vs_currencies"].split(",") if currency.strip()]
+        return self.batcher.request(ids, currencies)
+
+    def _fetch(self, path, params):
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            # Uma cobrança por requisição HTTP de verdade: cada retry conta, um lote conta uma vez só
+            with self._lock:
+                self.counters["http_requests"] += 1
+            if self.on_request:
+                self.on_request()
+            response = self.session.get(self.base_url + path, params=params, timeout=self.timeout)
+            if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                response.raise_for_status()
+                return response.json()
+
+            delay = retry_after_seconds(response.headers.get("Retry-After"))
+            if delay is None:
+                delay = backoff_delay(attempt)
+            with self._lock:
+                self.counters["retries"] += 1
+            print(f"⏳ CoinGecko returned {response.status_code}, retrying in {delay:.1f}s...")
+            if response.status_code == 429:
+                # O próximo acquire() espera o bloqueio junto com as outras threads
+                self.bucket.block(delay)
+            else:
+                time.sleep(delay)
+
+    def _store(self, key, data, expires_at):
+        self._cache[key] = (expires_at, data)
+        self._cache.move_to_end(key)
+
+        now = time.monotonic()
+        for stale in [k for k, (exp, _) in self._cache.items() if exp <= now]:
+            del self._cache[stale]
+            self.counters["evictions"] += 1
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats["cache_size"] = len(self._cache)
+        if self.batcher:
+            stats["price_batches"] = self.batcher.stats()
+        return stats
+
+    def close(self):
+        self.session.close()
@@ -10,3 +10,10 @@ CREATE TABLE consultas(
     custo_chatgpt FLOAT,
     custo_coingecko FLOAT
 )
+
+-- Opcional: custos de TTS/vídeo e tempos por etapa (persistence.py detecta as colunas)
+ALTER TABLE consultas
+    ADD COLUMN custo_tts FLOAT,
+    ADD COLUMN custo_video FLOAT,
+    ADD COLUMN tempo_total FLOAT,
+    ADD COLUMN tempos_etapas TEXT
@@ -0,0 +1,161 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "cache/jobs.db")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+
+FINAL_STATUSES = ("done", "failed")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs(
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    stage TEXT,
+    payload TEXT,
+    result TEXT,
+    error TEXT,
+    created FLOAT,
+    updated FLOAT
+)
+"""
+COLUMNS = ["id", "status", "stage", "payload", "result", "error", "created", "updated"]
+
+
+class JobStore:
+    def __init__(self, path=JOBS_DB_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Uma conexão só, protegida pelo lock: o volume de escrita é pequeno
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(SCHEMA)
+        self.conn.commit()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def _row_to_job(self, row):
+        if row is None:
+            return None
+        job = dict(zip(COLUMNS, row))
+        job["payload"] = json.loads(job["payload"] or "{}")
+        job["result"] = json.loads(job["result"] or "{}")
+        return job
+
+    def _get(self, job_id):
+        row = self.conn.execute(f"SELECT {', '.join(COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row)
+
+    def create(self, payload):
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO jobs (id, status, payload, result, created, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, "queued", json.dumps(payload), "{}", now, now),
+            )
+            self.conn.commit()
+            return self._get(job_id)
+
+    def update(self, job_id, result=None, **fields):
+        with self._changed:
+            job = self._get(job_id)
+            if job is None:
+                return None
+            # O resultado é incremental: o áudio aparece antes do vídeo ficar pronto
+            if result:
+                fields["result"] = json.dumps({**job["result"], **result})
+            fields["updated"] = time.time()
+            assignments = ", ".join(f"{column} = ?" for column in fields)
+            self.conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+            self.conn.commit()
+            self._changed.notify_all()
+            return self._get(job_id)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._get(job_id)
+
+    def wait(self, job_id, timeout=None):
+        # Long polling: devolve assim que o job terminar ou o tempo acabar
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._changed:
+            while True:
+                job = self._get(job_id)
+                if job is None or job["status"] in FINAL_STATUSES:
+                    return job
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return job
+                self._changed.wait(remaining)
+
+    def unfinished(self):
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM jobs WHERE status NOT IN (?, ?) ORDER BY created",
+                FINAL_STATUSES,
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def counts(self):
+        with self._lock:
+            return dict(self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+class JobQueue:
+    def __init__(self, handler, store=None, workers=JOB_WORKERS):
+        self.handler = handler
+        self.store = store or JobStore()
+        self._queue = queue.Queue()
+        self._contexts = {}
+        self._threads = [
+            threading.Thread(target=self._run, name=f"jobs-{index}", daemon=True) for index in range(workers)
+        ]
+
+        # ♻️ Jobs interrompidos por um restart voltam para a fila
+        for job in self.store.unfinished():
+            self._queue.put(job["id"])
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, payload, context=None):
+        job = self.store.create(payload)
+        # O contexto (ex.: a consulta em andamento) só vive em memória
+        if context is not None:
+            self._contexts[job["id"]] = context
+        self._queue.put(job["id"])
+        return job
+
+    def _run(self):
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            context = self._contexts.pop(job_id, None)
+            job = self.store.get(job_id)
+            if job is None or job["status"] in FINAL_STATUSES:
+                continue
+
+            job = self.store.update(job_id, status="running")
+            try:
+                result = self.handler(job, context, lambda **fields: self.store.update(job_id, **fields))
+                self.store.update(job_id, status="done", stage=None, result=result)
+            except Exception as e:
+                print(f"❌ Job {job_id} falhou: {e}")
+                traceback.print_exc()
+                self.store.update(job_id, status="failed", error=str(e))
+
+    def close(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+
+MEDIA_CACHE_DIR = os.getenv("MEDIA_CACHE_DIR", "static/cache")
+MEDIA_CACHE_MAX_BYTES = int(os.getenv("MEDIA_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+# Eviction desce até 90% do limite, para não varrer o cache de novo na escrita seguinte
+EVICT_TARGET = 0.9
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_TIMEOUT = float(os.getenv("MEDIA_DOWNLOAD_TIMEOUT", "120"))
+
+
+def content_key(*parts):
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class MediaStore:
+    def __init__(self, root=MEDIA_CACHE_DIR, max_bytes=MEDIA_CACHE_MAX_BYTES, session=None):
+        self.root = root
+        self.max_bytes = max_bytes
+        if session is None:
+            # Importado aqui: quem só usa content_key/file_digest não paga o import do requests
+            import requests
+
+            session = requests.Session()
+        self.session = session
+        self._lock = threading.Lock()
+        self._total_bytes = None
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def path_for(self, kind, key, ext):
+        return os.path.join(self.root, kind, key[:2], f"{key}.{ext}")
+
+    def get(self, kind, key, ext):
+        path = self.path_for(kind, key, ext)
+        try:
+            # mtime marca o último uso; é o que a eviction LRU ordena
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.counters["misses"] += 1
+            return None
+        with self._lock:
+            self.counters["hits"] += 1
+        return path
+
+    def put(self, kind, key, ext, write):
+        # Escreve num temporário ao lado e troca atomicamente: leitores nunca veem arquivo pela metade
+        path = self.path_for(kind, key, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.total_bytes()
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            write(tmp_path)
+            added = os.path.getsize(tmp_path)
+            try:
+                added -= os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        # Total corrente: o diretório só é percorrido quando o limite estoura
+        with self._lock:
+            self._total_bytes += added
+            total = self._total_bytes
+        if total > self.max_bytes:
+            self.evict()
+        return path
+
+    def download(self, url, kind, key, ext):
+        def write(tmp_path):
+            with self.session.get(str(url), stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+                response.raise_for_status()
+                with open(tmp_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+
+        return self.put(kind, key, ext, write)
+
+    def get_text(self, kind, key):
+        path = self.get(kind, key, "txt")
+        if not path:
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+
+    def put_text(self, kind, key, text):
+        def write(tmp_path):
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+
+        return self.put(kind, key, "txt", write)
+
+    def _scan(self):
+        entries = []
+        total = 0
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        return entries, total
+
+    def total_bytes(self):
+        # Semeado com uma varredura só, na primeira escrita
+        with self._lock:
+            total = self._total_bytes
+        if total is None:
+            _, total = self._scan()
+            with self._lock:
+                if self._total_bytes is None:
+                    self._total_bytes = total
+                total = self._total_bytes
+        return total
+
+    def evict(self):
+        entries, total = self._scan()
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes * EVICT_TARGET:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            total -= size
+            with self._lock:
+                self.counters["evictions"] += 1
+        with self._lock:
+            self._total_bytes = total
+
+    def stats(self):
+        with self._lock:
+            return {**self.counters, "bytes": self._total_bytes}
@@ -0,0 +1,356 @@
+import atexit
+import contextvars
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import unquote, urlsplit
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///cache/consultas.db")
+WRITER_BATCH_SIZE = int(os.getenv("CONSULTAS_BATCH_SIZE", "50"))
+WRITER_FLUSH_INTERVAL = float(os.getenv("CONSULTAS_FLUSH_INTERVAL", "1.0"))
+
+# 💸 Custos estimados em USD; ajuste pelo .env conforme o plano de cada serviço
+DEEPSEEK_INPUT_COST_PER_MTOK = float(os.getenv("DEEPSEEK_INPUT_COST_PER_MTOK", "3.75"))
+DEEPSEEK_OUTPUT_COST_PER_MTOK = float(os.getenv("DEEPSEEK_OUTPUT_COST_PER_MTOK", "10.0"))
+COINGECKO_COST_PER_CALL = float(os.getenv("COINGECKO_COST_PER_CALL", "0.0"))
+KOKORO_COST_PER_CALL = float(os.getenv("KOKORO_COST_PER_CALL", "0.0007"))
+SADTALKER_COST_PER_CALL = float(os.getenv("SADTALKER_COST_PER_CALL", "0.12"))
+CHARS_PER_TOKEN = 4
+
+COST_COLUMNS = {
+    "llm": "custo_chatgpt",
+    "coingecko": "custo_coingecko",
+    "tts": "custo_tts",
+    "video": "custo_video",
+}
+# 🗃️ O esquema original (db.py) só tem estas; as extras entram apenas se a tabela já tiver as colunas
+BASE_COLUMNS = ["data_consulta", "pergunta", "resposta", "custo_chatgpt", "custo_coingecko"]
+EXTRA_COLUMNS = ["custo_tts", "custo_video", "tempo_total", "tempos_etapas"]
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS consultas(
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    data_consulta TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    pergunta VARCHAR(255),
+    resposta TEXT,
+    custo_chatgpt FLOAT,
+    custo_coingecko FLOAT,
+    custo_tts FLOAT,
+    custo_video FLOAT,
+    tempo_total FLOAT,
+    tempos_etapas TEXT
+)
+"""
+
+_current = contextvars.ContextVar("consulta", default=None)
+
+
+def llm_cost(prompt_chars, output_chars):
+    return (
+        prompt_chars / CHARS_PER_TOKEN * DEEPSEEK_INPUT_COST_PER_MTOK
+        + output_chars / CHARS_PER_TOKEN * DEEPSEEK_OUTPUT_COST_PER_MTOK
+    ) / 1_000_000
+
+
+class Consulta:
+    def __init__(self, question):
+        self.question = question
+        self.answer = None
+        self.started = time.time()
+        self.costs = dict.fromkeys(COST_COLUMNS, 0.0)
+        self.timings = {}
+        self._lock = threading.Lock()
+
+    def add_cost(self, stage, amount):
+        with self._lock:
+            self.costs[stage] = self.costs.get(stage, 0.0) + amount
+
+    def add_timing(self, stage, seconds):
+        with self._lock:
+            self.timings[stage] = round(self.timings.get(stage, 0.0) + seconds, 3)
+
+    def to_row(self):
+        with self._lock:
+            return {
+                "data_consulta": datetime.fromtimestamp(self.started).strftime("%Y-%m-%d %H:%M:%S"),
+                "pergunta": self.question[:255],
+                "resposta": self.answer,
+                **{column: self.costs[stage] for stage, column in COST_COLUMNS.items()},
+                "tempo_total": round(time.time() - self.started, 3),
+                "tempos_etapas": json.dumps(self.timings),
+            }
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def activate(consulta):
+    token = _current.set(consulta)
+    try:
+        yield consulta
+    finally:
+        _current.reset(token)
+
+
+def add_cost(stage, amount):
+    consulta = _current.get()
+    if consulta is not None and amount:
+        consulta.add_cost(stage, amount)
+
+
+@contextmanager
+def stage(name):
+    started = time.time()
+    try:
+        yield
+    finally:
+        consulta = _current.get()
+        if consulta is not None:
+            consulta.add_timing(name, time.time() - started)
+
+
+class SQLiteBackend:
+    placeholder = "?"
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self.connection() as conn:
+            conn.execute(SQLITE_SCHEMA)
+            conn.commit()
+
+    @contextmanager
+    def connection(self):
+        # Uma conexão por thread, reaproveitada entre chamadas
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            self._local.conn = conn
+        yield conn
+
+
+class MySQLBackend:
+    placeholder = "%s"
+
+    def __init__(self, host, port, user, password, database, pool_size=5):
+        import mysql.connector.pooling
+
+        self.pool = mysql.connector.pooling.MySQLConnectionPool(
+            pool_name="consultas",
+            pool_size=pool_size,
+            host=host,
+            port=port,
+            user=user,
+            password=password,
+            database=database,
+        )
+
+    @contextmanager
+    def connection(self):
+        conn = self.pool.get_connection()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+
+def backend_from_url(url=DATABASE_URL):
+    parts = urlsplit(url)
+    if parts.scheme == "sqlite":
+        # sqlite:///relativo.db ou sqlite:////caminho/absoluto.db
+        return SQLiteBackend(unquote(parts.path[1:]) or ":memory:")
+    if parts.scheme == "mysql":
+        return MySQLBackend(
+            host=parts.hostname or "localhost",
+            port=parts.port or 3306,
+            user=unquote(parts.username or ""),
+            password=unquote(parts.password or ""),
+            database=parts.path.lstrip("/") or "crypto_consultas",
+        )
+    raise ValueError(f"Unsupported DATABASE_URL scheme: {parts.scheme}")
+
+
+def table_columns(backend):
+    # Lido uma vez por backend: funciona igual no SQLite e no MySQL
+    columns = getattr(backend, "columns", None)
+    if columns is None:
+        with backend.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT * FROM consultas LIMIT 0")
+                cursor.fetchall()
+                columns = {description[0] for description in cursor.description}
+            finally:
+                cursor.close()
+        backend.columns = columns
+    return columns
+
+
+def insert_columns(backend):
+    available = table_columns(backend)
+    return BASE_COLUMNS + [column for column in EXTRA_COLUMNS if column in available]
+
+
+def insert_many(backend, rows):
+    columns = insert_columns(backend)
+    placeholders = ", ".join([backend.placeholder] * len(columns))
+    sql = f"INSERT INTO consultas ({', '.join(columns)}) VALUES ({placeholders})"
+    with backend.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.executemany(sql, [tuple(row[column] for column in columns) for row in rows])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+
+class ConsultaWriter:
+    def __init__(self, backend, batch_size=WRITER_BATCH_SIZE, flush_interval=WRITER_FLUSH_INTERVAL):
+        self.backend = backend
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._stop = object()
+        self.counters = {"written": 0, "batches": 0, "failed": 0}
+        self._thread = threading.Thread(target=self._run, name="consultas-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, consulta):
+        # Só enfileira: quem está atendendo a pergunta nunca espera o banco
+        self._queue.put(consulta.to_row())
+
+    def _run(self):
+        running = True
+        while running:
+            rows = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(rows) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is self._stop:
+                    running = False
+                    break
+                rows.append(item)
+            if rows:
+                self._write(rows)
+
+    def _write(self, rows):
+        try:
+            insert_many(self.backend, rows)
+            self.counters["written"] += len(rows)
+            self.counters["batches"] += 1
+        except Exception as e:
+            self.counters["failed"] += len(rows)
+            print(f"❌ Erro ao gravar {len(rows)} consulta(s) no banco: {e}")
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(self._stop)
+            self._thread.join()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            backend = backend_from_url()
+            missing = [column for column in EXTRA_COLUMNS if column not in table_columns(backend)]
+            if missing:
+                print(f"ℹ️ Tabela consultas sem {', '.join(missing)}: esses campos não serão gravados (migração opcional em db.py)")
+            _writer = ConsultaWriter(backend)
+            atexit.register(_writer.close)
+        return _writer
+
+
+def start_consulta(question):
+    return Consulta(question)
+
+
+def finish_consulta(consulta, answer=None):
+    if answer is not None:
+        consulta.answer = answer
+    try:
+        writer().submit(consulta)
+    except Exception as e:
+        print(f"⚠️ Não foi possível registrar a consulta: {e}")
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def cost_summary(backend, since=None):
+    available = table_columns(backend)
+    stages = [stage for stage, column in COST_COLUMNS.items() if column in available]
+    sums = ", ".join(f"SUM({COST_COLUMNS[stage]}), AVG({COST_COLUMNS[stage]})" for stage in stages)
+    sql = f"SELECT COUNT(*), {sums} FROM consultas"
+    params = ()
+    if since:
+        sql += f" WHERE data_consulta >= {backend.placeholder}"
+        params = (since,)
+    with backend.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+        cursor.close()
+
+    summary = {"consultas": row[0], "total": 0.0}
+    for index, stage in enumerate(stages):
+        total, average = row[1 + index * 2] or 0.0, row[2 + index * 2] or 0.0
+        summary[stage] = {"total": total, "avg": average}
+        summary["total"] += total
+    return summary
+
+
+def latency_summary(backend, since=None):
+    if not {"tempo_total", "tempos_etapas"} <= table_columns(backend):
+        return {"total": {"count": 0, "avg": None, "p50": None, "p95": None}, "stages": {}}
+    sql = "SELECT tempo_total, tempos_etapas FROM consultas"
+    params = ()
+    if since:
+        sql += f" WHERE data_consulta >= {backend.placeholder}"
+        params = (since,)
+    with backend.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+        cursor.close()
+
+    totals = [row[0] for row in rows if row[0] is not None]
+    stages = {}
+    for _, timings in rows:
+        for name, seconds in json.loads(timings or "{}").items():
+            stages.setdefault(name, []).append(seconds)
+
+    def describe(values):
+        return {
+            "count": len(values),
+            "avg": sum(values) / len(values) if values else None,
+            "p50": _percentile(values, 50),
+            "p95": _percentile(values, 95),
+        }
+
+    return {"total": describe(totals), "stages": {name: describe(values) for name, values in stages.items()}}
@@ -0,0 +1,307 @@
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from urllib.parse import parse_qsl
+
+import numpy as np
+
+PRICE_STORE_DIR = os.getenv("PRICE_STORE_DIR", "cache/prices")
+RANGE_CHUNK_SECONDS = 90 * 86400
+TAIL_TOLERANCE_SECONDS = int(os.getenv("PRICE_STORE_TAIL_TOLERANCE", "300"))
+RAW_RETENTION_MS = 86_400_000
+COMPACT_AFTER_ROWS = int(os.getenv("PRICE_STORE_COMPACT_ROWS", "5000"))
+HOUR_MS = 3_600_000
+DAY_MS = 86_400_000
+
+# 📦 Uma coluna por arquivo: timestamps (ms) em int64, o resto em float64
+COLUMNS = {
+    "ts": np.dtype("<i8"),
+    "prices": np.dtype("<f8"),
+    "market_caps": np.dtype("<f8"),
+    "total_volumes": np.dtype("<f8"),
+}
+VALUE_COLUMNS = ["prices", "market_caps", "total_volumes"]
+
+HISTORY_ENDPOINT = re.compile(r"^/coins/([^/?]+)/market_chart(/range)?\?(.*)$")
+# coin e vs_currency viram nome de diretório: nada de "/", ".." ou maiúsculas
+SAFE_ID = re.compile(r"[a-z0-9\-]+")
+
+
+def parse_history_endpoint(endpoint, now=None):
+    match = HISTORY_ENDPOINT.match(endpoint)
+    if not match:
+        return None
+    coin, is_range, query = match.groups()
+    params = dict(parse_qsl(query))
+    vs_currency = params.get("vs_currency")
+    if not vs_currency or not SAFE_ID.fullmatch(coin) or not SAFE_ID.fullmatch(vs_currency):
+        return None
+
+    now = int(now or time.time())
+    try:
+        if is_range:
+            return coin, vs_currency, int(float(params["from"])), int(float(params["to"]))
+        return coin, vs_currency, now - int(params["days"]) * 86400, now
+    except (KeyError, ValueError):
+        # days=max e afins continuam indo direto para a API
+        return None
+
+
+def payload_to_columns(payload):
+    prices = np.asarray(payload.get("prices") or [], dtype=np.float64).reshape(-1, 2)
+    columns = {"ts": prices[:, 0].astype(np.int64), "prices": prices[:, 1]}
+    for key in ("market_caps", "total_volumes"):
+        # As três séries vêm alinhadas; se não vierem, alinha pelo timestamp do preço
+        series = np.asarray(payload.get(key) or [], dtype=np.float64).reshape(-1, 2)
+        values = np.full(len(prices), np.nan)
+        if len(series):
+            index = np.searchsorted(series[:, 0], prices[:, 0]).clip(0, len(series) - 1)
+            hit = series[index, 0] == prices[:, 0]
+            values[hit] = series[index[hit], 1]
+        columns[key] = values
+    return columns
+
+
+def last_per_bucket(columns, bucket_ms):
+    if not len(columns["ts"]):
+        return columns
+    buckets = columns["ts"] // bucket_ms
+    # Último ponto de cada balde: índices onde o balde muda, olhando para frente
+    keep = np.append(buckets[1:] != buckets[:-1], True)
+    return {name: values[keep] for name, values in columns.items()}
+
+
+def merge_intervals(intervals):
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def missing_intervals(covered, start, end, tolerance=0):
+    # [start, end] menos o que já está em disco; buracos menores que a tolerância não valem uma chamada
+    gaps = []
+    cursor = start
+    for covered_from, covered_to in covered:
+        if covered_to <= cursor:
+            continue
+        if covered_from >= end:
+            break
+        if covered_from > cursor:
+            gaps.append((cursor, covered_from))
+        cursor = max(cursor, covered_to)
+    if cursor < end:
+        gaps.append((cursor, end))
+    return [(gap_start, gap_end) for gap_start, gap_end in gaps if gap_end - gap_start > tolerance]
+
+
+def sorted_unique(columns):
+    order = np.argsort(columns["ts"], kind="stable")
+    columns = {name: values[order] for name, values in columns.items()}
+    # Timestamps repetidos: fica o último gravado
+    keep = np.append(columns["ts"][1:] != columns["ts"][:-1], True)
+    return {name: values[keep] for name, values in columns.items()}
+
+
+class PriceSeries:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self.meta = self._load_meta()
+        self._repair()
+
+    def _load_meta(self):
+        try:
+            with open(os.path.join(self.path, "meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = {"generation": 0}
+        # Formato antigo guardava um único intervalo contínuo
+        if "covered" not in meta:
+            covered_from, covered_to = meta.pop("covered_from", None), meta.pop("covered_to", None)
+            meta["covered"] = [[covered_from, covered_to]] if covered_from is not None else []
+        meta.setdefault("compacted_rows", 0)
+        return meta
+
+    def _save_meta(self):
+        meta_path = os.path.join(self.path, "meta.json")
+        with open(f"{meta_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(self.meta, f)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+    def _generation_dir(self, generation=None):
+        return os.path.join(self.path, f"gen-{self.meta['generation'] if generation is None else generation}")
+
+    def _column_path(self, name, generation=None):
+        return os.path.join(self._generation_dir(generation), f"{name}.bin")
+
+    def _repair(self):
+        # Um append interrompido pode deixar colunas com tamanhos diferentes; corta no menor
+        os.makedirs(self._generation_dir(), exist_ok=True)
+        sizes = []
+        for name, dtype in COLUMNS.items():
+            path = self._column_path(name)
+            sizes.append(os.path.getsize(path) // dtype.itemsize if os.path.exists(path) else 0)
+        rows = min(sizes)
+        for name, dtype in COLUMNS.items():
+            with open(self._column_path(name), "ab") as f:
+                f.truncate(rows * dtype.itemsize)
+
+    def __len__(self):
+        return os.path.getsize(self._column_path("ts")) // COLUMNS["ts"].itemsize
+
+    def _column(self, name):
+        if not len(self):
+            return np.empty(0, dtype=COLUMNS[name])
+        return np.memmap(self._column_path(name), dtype=COLUMNS[name], mode="r")
+
+    def last_timestamp(self):
+        ts = self._column("ts")
+        return int(ts[-1]) if len(ts) else None
+
+    def append(self, columns):
+        if not len(columns["ts"]):
+            return 0
+        last = self.last_timestamp()
+        if last is not None and columns["ts"][0] <= last:
+            fresh = columns["ts"] > last
+            columns = {name: values[fresh] for name, values in columns.items()}
+        for name, dtype in COLUMNS.items():
+            with open(self._column_path(name), "ab") as f:
+                f.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+        return len(columns["ts"])
+
+    def read(self, start_ms, end_ms):
+        ts = self._column("ts")
+        lo = int(np.searchsorted(ts, start_ms, side="left"))
+        hi = int(np.searchsorted(ts, end_ms, side="right"))
+        return {name: np.array(self._column(name)[lo:hi]) for name in COLUMNS}
+
+    def rewrite(self, columns):
+        generation = self.meta["generation"] + 1
+        os.makedirs(self._generation_dir(generation), exist_ok=True)
+        for name, dtype in COLUMNS.items():
+            np.ascontiguousarray(columns[name], dtype=dtype).tofile(self._column_path(name, generation))
+
+        old_dir = self._generation_dir()
+        self.meta["generation"] = generation
+        self._save_meta()
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    def merge(self, columns):
+        current = {name: np.array(self._column(name)) for name in COLUMNS}
+        self.rewrite(sorted_unique({name: np.concatenate([columns[name], current[name]]) for name in COLUMNS}))
+
+    def compact(self, now_ms=None):
+        columns = sorted_unique({name: np.array(self._column(name)) for name in COLUMNS})
+
+        # Fora da janela recente, um ponto por hora basta
+        now_ms = now_ms or int(time.time() * 1000)
+        old = columns["ts"] < now_ms - RAW_RETENTION_MS
+        older = last_per_bucket({name: values[old] for name, values in columns.items()}, HOUR_MS)
+        columns = {name: np.concatenate([older[name], values[~old]]) for name, values in columns.items()}
+
+        before = len(self)
+        self.rewrite(columns)
+        self.meta["compacted_rows"] = len(columns["ts"])
+        self._save_meta()
+        return before - len(columns["ts"])
+
+
+class PriceStore:
+    def __init__(self, fetch_range, root=PRICE_STORE_DIR, compact_after_rows=COMPACT_AFTER_ROWS, chunk_seconds=RANGE_CHUNK_SECONDS):
+        self.fetch_range = fetch_range
+        self.root = root
+        self.chunk_seconds = chunk_seconds
+        self.compact_after_rows = compact_after_rows
+        self._series = {}
+        self._lock = threading.Lock()
+        self.counters = {"queries": 0, "fetches": 0, "rows_from_disk": 0, "rows_fetched": 0}
+
+    def series(self, coin, vs_currency):
+        key = (coin, vs_currency)
+        with self._lock:
+            if key not in self._series:
+                self._series[key] = PriceSeries(os.path.join(self.root, f"{coin}-{vs_currency}"))
+            return self._series[key]
+
+    def _fetch(self, coin, vs_currency, start, end):
+        # Pedaços de até 90 dias: a CoinGecko devolve granularidade horária nessa janela
+        columns = []
+        while start < end:
+            chunk_end = min(start + self.chunk_seconds, end)
+            payload = self.fetch_range(coin, vs_currency, start, chunk_end)
+            columns.append(payload_to_columns(payload))
+            with self._lock:
+                self.counters["fetches"] += 1
+            start = chunk_end
+        # Pedaços vizinhos dividem o segundo da borda: o mesmo ponto vem duas vezes
+        return sorted_unique({name: np.concatenate([c[name] for c in columns]) for name in COLUMNS})
+
+    def backfill(self, coin, vs_currency, start, end):
+        series = self.series(coin, vs_currency)
+        with series.lock:
+            meta = series.meta
+            fetched = 0
+            # Só os buracos dentro de [start, end]; nunca mais do que a chamada direta buscaria
+            for gap_start, gap_end in missing_intervals(meta["covered"], start, end, TAIL_TOLERANCE_SECONDS):
+                columns = self._fetch(coin, vs_currency, gap_start, gap_end)
+                last = series.last_timestamp()
+                if last is None or not len(columns["ts"]) or columns["ts"][0] > last:
+                    fetched += series.append(columns)
+                else:
+                    # O trecho cai antes do fim: não dá para só anexar, regrava em ordem
+                    fetched += len(columns["ts"])
+                    series.merge(columns)
+                meta["covered"] = merge_intervals(meta["covered"] + [[gap_start, gap_end]])
+
+            # Cada atualização do final anexa pontos de 5 minutos; de tempos em tempos vira um por hora
+            if len(series) - meta["compacted_rows"] >= self.compact_after_rows:
+                series.compact()
+            series._save_meta()
+
+        with self._lock:
+            self.counters["rows_fetched"] += fetched
+        return fetched
+
+    def query(self, coin, vs_currency, start, end):
+        with self._lock:
+            self.counters["queries"] += 1
+        self.backfill(coin, vs_currency, start, end)
+
+        series = self.series(coin, vs_currency)
+        with series.lock:
+            columns = series.read(start * 1000, end * 1000)
+        with self._lock:
+            self.counters["rows_from_disk"] += len(columns["ts"])
+
+        # Mesma granularidade que a /market_chart devolveria para esse período
+        span = end - start
+        if span > 90 * 86400:
+            columns = last_per_bucket(columns, DAY_MS)
+        elif span > 86400:
+            columns = last_per_bucket(columns, HOUR_MS)
+
+        ts = columns["ts"].tolist()
+        payload = {}
+        for name in VALUE_COLUMNS:
+            values = columns[name]
+            valid = ~np.isnan(values)
+            payload[name] = [[t, v] for t, v, ok in zip(ts, values.tolist(), valid.tolist()) if ok]
+        return payload
+
+    def compact(self, coin, vs_currency):
+        series = self.series(coin, vs_currency)
+        with series.lock:
+            return series.compact()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters)
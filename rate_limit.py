@@ -0,0 +1,121 @@
+import contextvars
+import random
+import threading
+import time
+from concurrent.futures import Future
+from email.utils import parsedate_to_datetime
+
+# 🎟️ Chamadas por minuto de cada plano da CoinGecko
+TIER_LIMITS = {"demo": 30, "analyst": 500, "lite": 500, "pro": 1000}
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60
+        self.capacity = capacity or max(1, rate_per_minute // 3)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def block(self, seconds):
+        # Depois de um 429 ninguém passa até o servidor liberar, não só quem tomou o erro
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+def retry_after_seconds(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, base=1.0, cap=30.0):
+    # "Full jitter": espalha as novas tentativas de quem falhou junto
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class SimplePriceBatcher:
+    def __init__(self, fetch, window=0.05, max_ids=100):
+        self.fetch = fetch
+        self.window = window
+        self.max_ids = max_ids
+        self._pending = []
+        self._timer = None
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "batches": 0}
+
+    def request(self, ids, vs_currencies):
+        future = Future()
+        with self._lock:
+            # O contexto de quem chegou primeiro vai junto: o custo do lote cai na consulta dele
+            self._pending.append((ids, vs_currencies, future, contextvars.copy_context()))
+            self.counters["requests"] += 1
+            pending_ids = {coin for entry in self._pending for coin in entry[0]}
+            if len(pending_ids) >= self.max_ids:
+                flush_now = True
+            else:
+                flush_now = False
+                if self._timer is None:
+                    self._timer = threading.Timer(self.window, self._flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+        if flush_now:
+            self._flush()
+        return future.result()
+
+    def _flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not batch:
+                return
+            self.counters["batches"] += 1
+
+        all_ids = sorted({coin for ids, _, _, _ in batch for coin in ids})
+        all_currencies = sorted({currency for _, currencies, _, _ in batch for currency in currencies})
+        try:
+            data = batch[0][3].run(self.fetch, [("ids", ",".join(all_ids)), ("vs_currencies", ",".join(all_currencies))])
+            # Cada chamador recebe só as moedas e cotações que pediu
+            for ids, currencies, future, _ in batch:
+                future.set_result({
+                    coin: {currency: data[coin][currency] for currency in currencies if currency in data[coin]}
+                    for coin in ids
+                    if coin in data
+                })
+        except BaseException as e:
+            # Ninguém pode ficar esperando para sempre: quem ainda não recebeu resposta recebe o erro
+            for _, _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters)
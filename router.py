@@ -0,0 +1,367 @@
+import atexit
+import json
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timezone
+from urllib.parse import parse_qsl, urlsplit
+
+ROUTER_CACHE_PATH = os.getenv("ROUTER_CACHE_PATH", "cache/router_cache.json")
+ROUTER_CACHE_SIZE = int(os.getenv("ROUTER_CACHE_SIZE", "512"))
+ROUTER_MIN_CONFIDENCE = float(os.getenv("ROUTER_MIN_CONFIDENCE", "0.75"))
+ROUTER_FLUSH_DELAY = float(os.getenv("ROUTER_FLUSH_DELAY", "2.0"))
+
+Route = namedtuple("Route", ["endpoint", "confidence", "source"])
+
+# 🪙 Apelidos mais comuns -> id da CoinGecko
+COIN_ALIASES = {
+    "bitcoin": "bitcoin", "btc": "bitcoin",
+    "ethereum": "ethereum", "ether": "ethereum", "eth": "ethereum",
+    "solana": "solana", "sol": "solana",
+    "cardano": "cardano", "ada": "cardano",
+    "dogecoin": "dogecoin", "doge": "dogecoin",
+    "ripple": "ripple", "xrp": "ripple",
+    "litecoin": "litecoin", "ltc": "litecoin",
+    "tether": "tether", "usdt": "tether",
+    "usdc": "usd-coin",
+    "bnb": "binancecoin", "binance coin": "binancecoin",
+    "polkadot": "polkadot",
+    "polygon": "matic-network", "matic": "matic-network",
+    "avalanche": "avalanche-2", "avax": "avalanche-2",
+    "chainlink": "chainlink",
+    "tron": "tron", "trx": "tron",
+    "shiba inu": "shiba-inu", "shib": "shiba-inu",
+    "toncoin": "the-open-network",
+    "pepe": "pepe",
+    "stellar": "stellar", "xlm": "stellar",
+    "monero": "monero", "xmr": "monero",
+}
+
+CURRENCY_ALIASES = {
+    "usd": "usd", "dollar": "usd", "dollars": "usd", "dólar": "usd", "dólares": "usd", "dolar": "usd", "dolares": "usd",
+    "eur": "eur", "euro": "eur", "euros": "eur",
+    "brl": "brl", "reais": "brl",
+    "gbp": "gbp", "pound": "gbp", "pounds": "gbp",
+    "jpy": "jpy", "yen": "jpy",
+    "cad": "cad", "aud": "aud", "chf": "chf", "cny": "cny", "inr": "inr",
+}
+
+UNIT_DAYS = {
+    "hour": 1 / 24, "hours": 1 / 24,
+    "day": 1, "days": 1, "dia": 1, "dias": 1,
+    "week": 7, "weeks": 7, "semana": 7, "semanas": 7,
+    "month": 30, "months": 30, "mes": 30, "mês": 30, "meses": 30,
+    "year": 365, "years": 365, "ano": 365, "anos": 365,
+}
+
+OHLC_DAYS = [1, 7, 14, 30, 90, 180, 365]
+
+PRICE_WORDS = r"\b(price|prices|worth|cost|costs|quote|value|trading at|how much|preço|preco|cotação|cotacao|quanto)\b"
+HISTORY_WORDS = (
+    r"\b(average|avg|mean|high|highest|peak|low|lowest|history|historical|chart|trend|performance|"
+    r"change|changed|volatility|média|media|máxima|maxima|mínima|minima|histórico|historico)\b"
+)
+TODAY_WORDS = r"\b(today|24h|hoje)\b"
+# ⏪ Perguntas sobre o passado: /simple/price responderia com a cotação de hoje
+PAST_WORDS = (
+    r"\b(yesterday|ontem|ago|atrás|atras|was worth|were worth|used to|back in|valia|custava|custou|"
+    r"anteontem|last year|ano passado)\b|\b(19|20)\d{2}\b"
+)
+OHLC_WORDS = r"\b(ohlc|candle|candles|candlestick|candlesticks)\b"
+MARKETS_WORDS = r"\b(top \d+|top coins|top cryptos?|ranking|largest|biggest|markets)\b"
+EXCHANGE_WORDS = r"\bexchange rates?\b"
+GLOBAL_WORDS = r"\b(global|total market cap|dominance|whole market|entire market|crypto market)\b"
+
+# 📜 Gramática dos endpoints aceitos: caminho -> parâmetros obrigatórios
+COIN_ID = r"[a-z0-9][a-z0-9\-]*"
+ENDPOINT_GRAMMAR = [
+    (r"^/simple/price$", {"ids", "vs_currencies"}),
+    (rf"^/coins/{COIN_ID}/market_chart$", {"vs_currency", "days"}),
+    (rf"^/coins/{COIN_ID}/market_chart/range$", {"vs_currency", "from", "to"}),
+    (rf"^/coins/{COIN_ID}/ohlc$", {"vs_currency", "days"}),
+    (r"^/coins/markets$", {"vs_currency"}),
+    (rf"^/coins/{COIN_ID}$", set()),
+    (r"^/exchange_rates$", set()),
+    (r"^/global$", set()),
+]
+NUMERIC_PARAMS = {"from", "to"}
+# Valores que acabam em nomes de arquivo (price_store) ou na URL: só ids simples
+ID_PARAMS = {"vs_currency": r"[a-z0-9\-]+", "vs_currencies": r"[a-z0-9\-]+(,[a-z0-9\-]+)*", "ids": r"[a-z0-9\-]+(,[a-z0-9\-]+)*"}
+
+
+def is_valid_endpoint(endpoint):
+    if not endpoint or not endpoint.startswith("/"):
+        return False
+    parts = urlsplit(endpoint)
+    params = dict(parse_qsl(parts.query, keep_blank_values=True))
+    for pattern, required in ENDPOINT_GRAMMAR:
+        if not re.match(pattern, parts.path):
+            continue
+        if not required <= {key for key, value in params.items() if value}:
+            return False
+        if "days" in required and not (params["days"].isdigit() or params["days"] == "max"):
+            return False
+        if not all(re.fullmatch(pattern, params[key]) for key, pattern in ID_PARAMS.items() if key in params):
+            return False
+        return all(re.fullmatch(r"\d+(\.\d+)?", params[key]) for key in NUMERIC_PARAMS & required)
+    return False
+
+
+def normalize_question(question):
+    text = question.lower().strip()
+    text = re.sub(r"[^\w\s\-]", " ", text)
+    return " ".join(text.split())
+
+
+def _find_aliases(text, aliases):
+    found = []
+    for alias in sorted(aliases, key=len, reverse=True):
+        for match in re.finditer(rf"\b{re.escape(alias)}\b", text):
+            found.append((match.start(), aliases[alias]))
+        text = re.sub(rf"\b{re.escape(alias)}\b", " " * len(alias), text)
+    ordered = []
+    for _, value in sorted(found):
+        if value not in ordered:
+            ordered.append(value)
+    return ordered
+
+
+def extract_coins(text):
+    return _find_aliases(text, COIN_ALIASES)
+
+
+def extract_currencies(text):
+    # "usd coin" / "usdt" não são moedas de cotação
+    text = re.sub(r"\busd coin\b", " ", text)
+    return _find_aliases(text, CURRENCY_ALIASES)
+
+
+def extract_days(text):
+    # "max" sozinho é ambíguo ("max supply"); só expressões explícitas pedem o histórico todo
+    if re.search(r"\b(all time|all-time|ever)\b", text):
+        return "max"
+
+    match = re.search(r"\b(\d+)\s*(hours?|days?|dias?|weeks?|semanas?|months?|m[eê]s|meses|years?|anos?)\b", text)
+    if match:
+        unit = match.group(2)
+        days = int(match.group(1)) * UNIT_DAYS.get(unit, UNIT_DAYS.get(unit.rstrip("s"), 1))
+        return max(1, round(days))
+
+    match = re.search(r"\b(\d+)d\b", text)
+    if match:
+        return max(1, int(match.group(1)))
+
+    match = re.search(r"\b(?:last|past|this|previous|último|ultimo|última|ultima)\s+(day|week|month|year|semana|m[eê]s|ano)\b", text)
+    if match:
+        return UNIT_DAYS[match.group(1)]
+
+    if re.search(TODAY_WORDS, text):
+        return 1
+    return None
+
+
+def _to_timestamp(value):
+    return int(datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp())
+
+
+def extract_date_range(text):
+    dates = re.findall(r"\b(\d{4}-\d{2}-\d{2})\b", text)
+    try:
+        if len(dates) >= 2:
+            start, end = sorted(_to_timestamp(d) for d in dates[:2])
+            return start, end + 86399
+        if len(dates) == 1 and re.search(r"\b(since|from|desde)\b", text):
+            return _to_timestamp(dates[0]), int(datetime.now(timezone.utc).timestamp())
+    except ValueError:
+        return None
+    return None
+
+
+def _snap_ohlc_days(days):
+    if days == "max":
+        return days
+    for allowed in OHLC_DAYS:
+        if days <= allowed:
+            return allowed
+    return "max"
+
+
+def classify(question):
+    text = normalize_question(question)
+    coins = extract_coins(text)
+    currencies = extract_currencies(text) or ["usd"]
+    currency = currencies[0]
+    days = extract_days(text)
+    date_range = extract_date_range(text)
+    history = re.search(HISTORY_WORDS, text)
+    # Ano solto ou data ISO sem "since/from" também apontam para o passado
+    past = re.search(PAST_WORDS, text)
+    price = re.search(PRICE_WORDS, text)
+
+    # "preço do bitcoin hoje" é cotação atual, não uma série de 24h
+    if days == 1 and price and not history and re.search(TODAY_WORDS, text):
+        days = None
+
+    if re.search(GLOBAL_WORDS, text) and not coins:
+        return Route("/global", 0.9, "rules")
+
+    if re.search(EXCHANGE_WORDS, text):
+        return Route("/exchange_rates", 0.85, "rules")
+
+    if re.search(MARKETS_WORDS, text) and not coins:
+        return Route(f"/coins/markets?vs_currency={currency}", 0.85, "rules")
+
+    if not coins:
+        return None
+
+    if re.search(OHLC_WORDS, text):
+        if len(coins) > 1:
+            return None
+        confidence = 0.85 if days else 0.6
+        return Route(f"/coins/{coins[0]}/ohlc?vs_currency={currency}&days={_snap_ohlc_days(days or 30)}", confidence, "rules")
+
+    if date_range:
+        if len(coins) > 1:
+            return None
+        start, end = date_range
+        return Route(f"/coins/{coins[0]}/market_chart/range?vs_currency={currency}&from={start}&to={end}", 0.9, "rules")
+
+    if history or days:
+        if len(coins) > 1:
+            return None
+        # Período sozinho não basta para pular o DeepSeek: precisa de uma palavra de histórico
+        confidence = 0.9 if history and days else 0.6
+        return Route(f"/coins/{coins[0]}/market_chart?vs_currency={currency}&days={days or 30}", confidence, "rules")
+
+    if past:
+        # Cotação atual para uma pergunta sobre o passado seria uma resposta errada sem fallback
+        return Route(f"/simple/price?ids={','.join(coins)}&vs_currencies={','.join(currencies)}", 0.4, "rules")
+    confidence = 0.9 if price else 0.6
+    return Route(f"/simple/price?ids={','.join(coins)}&vs_currencies={','.join(currencies)}", confidence, "rules")
+
+
+class IntentRouter:
+    def __init__(self, cache_path=ROUTER_CACHE_PATH, max_entries=ROUTER_CACHE_SIZE, min_confidence=ROUTER_MIN_CONFIDENCE,
+                 flush_delay=ROUTER_FLUSH_DELAY):
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+        self.min_confidence = min_confidence
+        self.flush_delay = flush_delay
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._flush_timer = None
+        self.counters = {
+            "lookups": 0,
+            "cache_hits": 0,
+            "rule_hits": 0,
+            "low_confidence": 0,
+            "misses": 0,
+            "learned": 0,
+            "forgotten": 0,
+        }
+        self.load()
+        atexit.register(self.flush)
+
+    def load(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Ignoring unreadable router cache {self.cache_path}: {e}")
+            return
+        with self._lock:
+            for key, endpoint in entries[-self.max_entries:]:
+                self._cache[key] = endpoint
+
+    def save(self):
+        if not self.cache_path:
+            return
+        # Uma escrita por vez, cada uma no seu arquivo temporário; falha aqui nunca derruba uma pergunta
+        with self._save_lock:
+            with self._lock:
+                entries = list(self._cache.items())
+            directory = os.path.dirname(self.cache_path)
+            tmp_path = None
+            try:
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=directory or ".", prefix=os.path.basename(self.cache_path), suffix=".tmp")
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(entries, f, ensure_ascii=False)
+                os.replace(tmp_path, self.cache_path)
+            except OSError as e:
+                print(f"⚠️ Could not save router cache {self.cache_path}: {e}")
+                if tmp_path and os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    def _schedule_save(self):
+        # Várias perguntas aprendidas em sequência viram uma única escrita, fora do caminho da requisição
+        with self._lock:
+            self._dirty = True
+            if self._flush_timer is not None:
+                return
+            self._flush_timer = threading.Timer(self.flush_delay, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def flush(self):
+        with self._lock:
+            timer, self._flush_timer = self._flush_timer, None
+            dirty, self._dirty = self._dirty, False
+        if timer is not None:
+            timer.cancel()
+        if dirty:
+            self.save()
+
+    def route(self, question):
+        key = normalize_question(question)
+        with self._lock:
+            self.counters["lookups"] += 1
+            endpoint = self._cache.get(key)
+            if endpoint:
+                self._cache.move_to_end(key)
+                self.counters["cache_hits"] += 1
+                return Route(endpoint, 1.0, "cache")
+
+        match = classify(question)
+        with self._lock:
+            if match and match.confidence >= self.min_confidence:
+                self.counters["rule_hits"] += 1
+                return match
+            self.counters["low_confidence" if match else "misses"] += 1
+        return None
+
+    def learn(self, question, endpoint):
+        # Intervalos com timestamps absolutos envelhecem; não vale a pena guardar
+        if not endpoint or "/market_chart/range" in endpoint:
+            return
+        key = normalize_question(question)
+        with self._lock:
+            self._cache[key] = endpoint
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+            self.counters["learned"] += 1
+        self._schedule_save()
+
+    def forget(self, question):
+        key = normalize_question(question)
+        with self._lock:
+            if self._cache.pop(key, None) is None:
+                return
+            self.counters["forgotten"] += 1
+        self._schedule_save()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats["cache_size"] = len(self._cache)
+        hits = stats["cache_hits"] + stats["rule_hits"]
+        stats["hit_rate"] = hits / stats["lookups"] if stats["lookups"] else 0.0
+        return stats
@@ -1,14 +1,19 @@
 import os
-import requests
 import time
 import re
-import uuid
+import threading
 import traceback
+import contextvars
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dotenv import load_dotenv
-import replicate
-import cloudinary
-import cloudinary.uploader
-import cloudinary.exceptions
+from router import IntentRouter, is_valid_endpoint
+from streaming import SentenceSplitter, ThinkFilter, stitch_wavs
+from media_cache import content_key, file_digest
+from summarize import summarize_payload
+from price_store import PriceStore, parse_history_endpoint
+import persistence
+from tracing import traced, tracer
 
 # 🧪 Carrega variáveis do .env
 load_dotenv()
@@ -21,20 +26,108 @@ if not REPLICATE_API_TOKEN or not COIN_GECKO_API:
 
 os.environ["REPLICATE_API_TOKEN"] = REPLICATE_API_TOKEN
 
-# 🔧 Configuração do Cloudinary
-cloudinary.config(
-    secure=True,
-    cloud_name=os.getenv("CLOUDINARY_URL").split("@")[-1],
-    api_key=os.getenv("CLOUDINARY_API_KEY"),
-    api_secret=os.getenv("CLOUDINARY_API_SECRET"),
-)
-
 # 🌟 Imagem do avatar
 SADTALKER_IMAGE_URL = "https://res.cloudinary.com/dixebxp5r/image/upload/c_crop,g_auto,h_800,w_800/renata"
-BASE_URL = "https://api.coingecko.com/api/v3"
+BASE_URL = os.getenv("COINGECKO_BASE_URL", "https://api.coingecko.com/api/v3")
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", "3"))
+SPECULATIVE_ROUTING = os.getenv("SPECULATIVE_ROUTING", "1") == "1"
+MAX_ENDPOINT_CANDIDATES = int(os.getenv("MAX_ENDPOINT_CANDIDATES", "3"))
+ENDPOINT_HEDGE_DELAY = float(os.getenv("ENDPOINT_HEDGE_DELAY", "0.75"))
+
+KOKORO_MODEL = "jaaari/kokoro-82m:f559560eb822dc509045f3921a1921234918b91739db4bf3daab2169b71c7a13"
+KOKORO_PARAMS = {"speed": 1, "voice": "af_alloy"}
+SADTALKER_MODEL = "cjwbw/sadtalker:a519cc0cfebaaeade068b23899165a11ec76aaa1d2b313d40d214f204ec957a3"
+SADTALKER_PARAMS = {
+    "facerender": "facevid2vid",
+    "pose_style": 0,
+    "preprocess": "crop",
+    "still_mode": True,
+    "use_enhancer": True,
+    "use_eyeblink": True,
+    "size_of_image": 256,
+    "expression_scale": 1,
+}
+
+# 🧭 Roteador local: evita uma chamada ao DeepSeek quando a pergunta é reconhecida
+router = IntentRouter()
+
+# ⏱️ Tempo de cada tentativa de roteamento/busca, para medir o ganho do modo especulativo
+routing_attempts = deque(maxlen=500)
+
+# 🐢 Clientes pesados só são importados/criados no primeiro uso: subir o processo fica barato
+_clients = {}
+_clients_lock = threading.RLock()
+
+def lazy_client(factory):
+    def getter():
+        with _clients_lock:
+            if factory.__name__ not in _clients:
+                _clients[factory.__name__] = factory()
+            return _clients[factory.__name__]
+
+    getter.__name__ = factory.__name__
+    return getter
+
+@lazy_client
+def get_replicate():
+    import replicate
+
+    return replicate
+
+@lazy_client
+def get_cloudinary():
+    import cloudinary
+    import cloudinary.uploader
+    import cloudinary.exceptions
+
+    # 🔧 Configuração do Cloudinary
+    cloudinary.config(
+        secure=True,
+        cloud_name=os.getenv("CLOUDINARY_URL").split("@")[-1],
+        api_key=os.getenv("CLOUDINARY_API_KEY"),
+        api_secret=os.getenv("CLOUDINARY_API_SECRET"),
+    )
+    return cloudinary
+
+@lazy_client
+def get_media_store():
+    from media_cache import MediaStore
+
+    # 🗄️ Áudios e vídeos endereçados pelo conteúdo: mesma resposta, mesmo arquivo
+    return MediaStore()
+
+@lazy_client
+def get_coingecko():
+    from coingecko import CoinGeckoClient
 
-def clean_response(text):
-    return re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL).strip()
+    # 🦎 Cliente CoinGecko com sessão persistente e cache por TTL
+    return CoinGeckoClient(
+        COIN_GECKO_API,
+        base_url=BASE_URL,
+        on_request=lambda: persistence.add_cost("coingecko", persistence.COINGECKO_COST_PER_CALL),
+    )
+
+@lazy_client
+def get_price_store():
+    # 📈 Histórico local por (moeda, cotação): só o trecho que falta vem da API
+    return PriceStore(
+        lambda coin, vs_currency, start, end: query_coingecko(
+            f"{BASE_URL}/coins/{coin}/market_chart/range?vs_currency={vs_currency}&from={start}&to={end}"
+        )
+    )
+
+def warm_up():
+    # Importa os clientes e abre a conexão com a CoinGecko antes da primeira pergunta
+    started = time.time()
+    get_replicate()
+    get_cloudinary()
+    get_media_store()
+    try:
+        get_coingecko().get(f"{BASE_URL}/ping")
+    except Exception as e:
+        print(f"⚠️ CoinGecko warm-up failed: {e}")
+    get_price_store()
+    return time.time() - started
 
 def remove_emojis(text):
     emoji_pattern = re.compile(
@@ -71,6 +164,28 @@ User question:
 "{question}"
 '''
 
+def build_candidates_prompt(question):
+    return f'''
+You are an expert in the CoinGecko API. Rank up to {MAX_ENDPOINT_CANDIDATES} endpoints that could answer the question, best first:
+
+- /simple/price?ids={{coin}}&vs_currencies={{currency}}
+- /coins/{{coin}}/market_chart?vs_currency={{currency}}&days={{days}}
+- /coins/{{coin}}/market_chart/range?vs_currency={{currency}}&from={{timestamp}}&to={{timestamp}}
+- /coins/{{coin}}/ohlc?vs_currency={{currency}}&days={{days}}
+- /coins/markets?vs_currency={{currency}}
+- /exchange_rates
+- /global
+
+IMPORTANT: When asked about averages, highs, lows, or historical data, use /coins/{{coin}}/market_chart with required parameters: vs_currency (usd), days (period).
+
+Return ONLY the full endpoints with parameters, WITHOUT the base URL, one per line, each surrounded by DOUBLE ASTERISKS (**), like this:
+**/simple/price?ids=bitcoin&vs_currencies=usd**
+**/coins/markets?vs_currency=usd**
+
+User question:
+"{question}"
+'''
+
 def build_alternative_prompt(question, failed_endpoints):
     return f'''
 The previous endpoint(s) failed: {failed_endpoints}.
@@ -82,15 +197,24 @@ Return ONLY the full endpoint with parameters, WITHOUT the base URL, surrounded
 No additional explanations.
 '''
 
+@traced()
 def build_final_prompt(question, coin_data):
+    # Séries longas viram uma tabela compacta em vez de milhares de pares [timestamp, valor]
     return f'''
-The user asked: "{question}". Based on this data from the CoinGecko API: {coin_data}, answer in a friendly, humorous, clear, and first-person tone.
+The user asked: "{question}". Based on this data from the CoinGecko API:
+
+{summarize_payload(question, coin_data)}
+
+Answer in a friendly, humorous, clear, and first-person tone.
 '''
 
-def query_deepseek_stream(prompt):
-    raw_response = ""
+@traced()
+def stream_deepseek(prompt):
+    # Entrega o texto visível à medida que chega, já sem o bloco <think>
+    think_filter = ThinkFilter()
+    raw_chars = 0
     try:
-        for event in replicate.stream(
+        for event in get_replicate().stream(
             "deepseek-ai/deepseek-r1",
             input={
                 "prompt": prompt,
@@ -101,34 +225,191 @@ def query_deepseek_stream(prompt):
                 "frequency_penalty": 0,
             },
         ):
-            raw_response += str(event)
+            event = str(event)
+            raw_chars += len(event)
+            visible = think_filter.feed(event)
+            if visible:
+                yield visible
     except Exception as e:
         print(f"❌ Erro ao consultar o modelo DeepSeek: {e}")
         traceback.print_exc()
-    return clean_response(raw_response).strip()
+    # O bloco <think> também é cobrado como saída
+    persistence.add_cost("llm", persistence.llm_cost(len(prompt), raw_chars))
+    rest = think_filter.flush()
+    if rest:
+        yield rest
 
+@traced()
+def query_deepseek_stream(prompt):
+    return "".join(stream_deepseek(prompt)).strip()
+
+@traced()
 def query_coingecko(endpoint):
-    headers = {
-        "accept": "application/json",
-        "x-cg-demo-api-key": COIN_GECKO_API,
-    }
+    import requests
+
     try:
-        response = requests.get(endpoint, headers=headers)
-        response.raise_for_status()
-        return response.json()
+        return get_coingecko().get(endpoint)
     except requests.exceptions.RequestException as e:
         print(f"❌ Erro ao consultar CoinGecko: {e}")
         raise
 
+@traced()
+def fetch_endpoint(endpoint):
+    history = parse_history_endpoint(endpoint)
+    if history:
+        return get_price_store().query(*history)
+    return query_coingecko(BASE_URL + endpoint)
+
 def extract_endpoint(response):
     match = re.search(r"\*\*(.*?)\*\*", response)
     return match.group(1).strip() if match else None
 
+def extract_endpoints(response):
+    endpoints = []
+    for endpoint in re.findall(r"\*\*(.*?)\*\*", response):
+        endpoint = endpoint.strip()
+        if endpoint.startswith(BASE_URL):
+            endpoint = endpoint[len(BASE_URL):]
+        if endpoint not in endpoints:
+            endpoints.append(endpoint)
+    return endpoints
+
+def is_valid_payload(data):
+    if not data:
+        return False
+    if isinstance(data, dict) and (data.get("error") or (data.get("status") or {}).get("error_code")):
+        return False
+    return True
+
+def record_attempt(question, kind, endpoint, started, error=None):
+    routing_attempts.append({
+        "question": question,
+        "kind": kind,
+        "endpoint": endpoint,
+        "seconds": round(time.time() - started, 3),
+        "ok": error is None,
+        "error": error,
+    })
+
+def attempt_stats():
+    stats = {}
+    for attempt in list(routing_attempts):
+        entry = stats.setdefault(attempt["kind"], {"count": 0, "ok": 0, "seconds": 0.0})
+        entry["count"] += 1
+        entry["ok"] += attempt["ok"]
+        entry["seconds"] += attempt["seconds"]
+    for entry in stats.values():
+        entry["avg_seconds"] = round(entry.pop("seconds") / entry["count"], 3)
+    return stats
+
+def timed_fetch(question, kind, endpoint):
+    started = time.time()
+    try:
+        data = fetch_endpoint(endpoint)
+    except Exception as e:
+        record_attempt(question, kind, endpoint, started, str(e))
+        raise
+    if not is_valid_payload(data):
+        record_attempt(question, kind, endpoint, started, "Invalid payload")
+        raise ValueError(f"Invalid payload from {endpoint}")
+    record_attempt(question, kind, endpoint, started)
+    return data
+
+def fetch_first_valid(question, endpoints):
+    # O melhor candidato sai na frente; o próximo só larga se ele falhar ou passar do ENDPOINT_HEDGE_DELAY.
+    # Quem não largou antes do vencedor nunca chega a gastar cota da API.
+    executor = ThreadPoolExecutor(max_workers=len(endpoints))
+    remaining = list(endpoints)
+    pending = {}
+
+    def launch():
+        endpoint = remaining.pop(0)
+        pending[executor.submit(contextvars.copy_context().run, timed_fetch, question, "candidate", endpoint)] = endpoint
+
+    try:
+        launch()
+        while pending:
+            finished, _ = wait(pending, timeout=ENDPOINT_HEDGE_DELAY if remaining else None, return_when=FIRST_COMPLETED)
+            if not finished:
+                launch()
+                continue
+            for future in finished:
+                endpoint = pending.pop(future)
+                try:
+                    return endpoint, future.result()
+                except Exception as e:
+                    print(f"⚠️ Candidate {endpoint} failed: {e}")
+                    if remaining:
+                        launch()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return None, None
+
+@traced()
 def get_data(question):
     failed_endpoints = []
+
+    route = router.route(question)
+    if route:
+        print(f"🧭 Endpoint resolved locally ({route.source}, confidence {route.confidence:.2f}): {route.endpoint}")
+        try:
+            return timed_fetch(question, "local", route.endpoint)
+        except Exception as e:
+            print(f"⚠️ Local route failed, asking DeepSeek instead: {e}")
+            router.forget(question)
+            failed_endpoints.append(route.endpoint)
+
+    if SPECULATIVE_ROUTING:
+        return get_data_speculative(question, failed_endpoints)
+    return get_data_sequential(question, failed_endpoints)
+
+def get_data_speculative(question, failed_endpoints):
+    started = time.time()
+    response_text = query_deepseek_stream(build_candidates_prompt(question))
+    record_attempt(question, "llm", None, started)
+
+    candidates = []
+    for endpoint in extract_endpoints(response_text)[:MAX_ENDPOINT_CANDIDATES]:
+        if endpoint in failed_endpoints:
+            continue
+        if not is_valid_endpoint(endpoint):
+            print(f"⚠️ Discarding malformed endpoint: {endpoint}")
+            failed_endpoints.append(endpoint)
+            continue
+        candidates.append(endpoint)
+
+    if candidates:
+        print(f"🏁 Racing {len(candidates)} candidate endpoint(s): {', '.join(candidates)}")
+        endpoint, data = fetch_first_valid(question, candidates)
+        if endpoint:
+            router.learn(question, endpoint)
+            return data
+        failed_endpoints.extend(candidates)
+    else:
+        failed_endpoints.append("Extraction failed")
+
+    # Último recurso: mais uma rodada do DeepSeek, já sabendo o que falhou
+    print("🔄 Trying alternative endpoint...")
+    started = time.time()
+    endpoint = extract_endpoint(query_deepseek_stream(build_alternative_prompt(question, failed_endpoints)))
+    record_attempt(question, "llm", None, started)
+    if not endpoint:
+        print("⚠️ Failed to extract endpoint from model response.")
+        return None
+    try:
+        data = timed_fetch(question, "alternative", endpoint)
+    except Exception as e:
+        print(f"❌ Alternative endpoint also failed: {e}")
+        return None
+    router.learn(question, endpoint)
+    return data
+
+def get_data_sequential(question, failed_endpoints):
     for attempt in range(2):
         prompt = build_initial_prompt(question) if attempt == 0 else build_alternative_prompt(question, failed_endpoints)
+        started = time.time()
         response_text = query_deepseek_stream(prompt)
+        record_attempt(question, "llm", None, started)
         endpoint = extract_endpoint(response_text)
 
         if not endpoint:
@@ -136,10 +417,10 @@ def get_data(question):
             failed_endpoints.append("Extraction failed")
             continue
 
-        full_url = BASE_URL + endpoint
-
         try:
-            return query_coingecko(full_url)
+            data = timed_fetch(question, "sequential", endpoint)
+            router.learn(question, endpoint)
+            return data
         except Exception as e:
             print(f"⚠️ CoinGecko request error (attempt {attempt+1}): {e}")
             failed_endpoints.append(endpoint)
@@ -150,33 +431,34 @@ def get_data(question):
                 print("❌ Alternative endpoint also failed.")
     return None
 
+def sanitize_tts_text(text):
+    sanitized_text = text.replace("\n", " ").strip()
+    return re.sub(r"[^\x00-\x7F]+", " ", sanitized_text)
+
+@traced()
 def save_audio_from_replicate(text):
+    import requests
+
+    replicate = get_replicate()
+    media_store = get_media_store()
     try:
-        sanitized_text = text.replace("\n", " ").strip()
-        sanitized_text = re.sub(r"[^\x00-\x7F]+", " ", sanitized_text)
+        sanitized_text = sanitize_tts_text(text)
+        audio_key = content_key(KOKORO_MODEL, KOKORO_PARAMS, sanitized_text)
+        cached_path = media_store.get("audio", audio_key, "wav")
+        if cached_path:
+            return cached_path
 
         output_url = replicate.run(
-            "jaaari/kokoro-82m:f559560eb822dc509045f3921a1921234918b91739db4bf3daab2169b71c7a13",
-            input={
-                "text": sanitized_text,
-                "speed": 1,
-                "voice": "af_alloy"
-            },
+            KOKORO_MODEL,
+            input={"text": sanitized_text, **KOKORO_PARAMS},
         )
+        persistence.add_cost("tts", persistence.KOKORO_COST_PER_CALL)
 
         if not output_url:
             print("⚠️ Falha ao gerar o áudio: o modelo não retornou URL.")
             return None
 
-        audio_id = str(uuid.uuid4())
-        audio_path = f"static/audio/{audio_id}.wav"
-
-        os.makedirs("static/audio", exist_ok=True)
-        audio_data = requests.get(output_url).content
-        with open(audio_path, "wb") as f:
-            f.write(audio_data)
-
-        return audio_path
+        return media_store.download(output_url, "audio", audio_key, "wav")
 
     except requests.exceptions.RequestException as e:
         print(f"❌ Erro de rede ao baixar o áudio: {e}")
@@ -188,10 +470,80 @@ def save_audio_from_replicate(text):
 
     return None
 
-def upload_to_cloudinary(audio_path):
+@traced()
+def save_audio_streaming(prompt):
+    return synthesize_audio(stream_deepseek(prompt))
+
+@traced()
+def synthesize_audio(chunks):
+    # Cada frase vai para o Kokoro assim que fica completa; os WAVs são costurados em ordem
+    splitter = SentenceSplitter()
+    parts = []
+    sentences = []
+    segments = []
+    started = time.time()
+
+    def first_segment_ready(future):
+        # Medido quando o primeiro WAV fica pronto, mesmo que o LLM ainda esteja escrevendo
+        seconds = time.time() - started
+        tracer.record("audio.first_segment", seconds)
+        print(f"🔈 First audio segment ready in {seconds:.2f}s")
+
+    with ThreadPoolExecutor(max_workers=TTS_WORKERS) as executor:
+        def submit(new_sentences):
+            for sentence in new_sentences:
+                clean_sentence = remove_emojis(sentence).strip()
+                if clean_sentence:
+                    sentences.append(sanitize_tts_text(clean_sentence))
+                    segments.append(executor.submit(contextvars.copy_context().run, save_audio_from_replicate, clean_sentence))
+                    if len(segments) == 1:
+                        segments[0].add_done_callback(first_segment_ready)
+
+        for chunk in chunks:
+            parts.append(chunk)
+            submit(splitter.feed(chunk))
+        submit(splitter.flush())
+
+        answer = "".join(parts).strip()
+        if not segments:
+            return answer, None
+
+        segment_paths = [future.result() for future in segments]
+
+    if not all(segment_paths):
+        print("⚠️ Some audio segments failed.")
+        return answer, None
+    if len(segment_paths) == 1:
+        return answer, segment_paths[0]
+
+    stitched_key = content_key(KOKORO_MODEL, KOKORO_PARAMS, sentences)
+    media_store = get_media_store()
+    audio_path = media_store.get("audio", stitched_key, "wav")
+    if audio_path:
+        return answer, audio_path
+
     try:
+        audio_path = media_store.put("audio", stitched_key, "wav", lambda tmp_path: stitch_wavs(segment_paths, tmp_path))
+    except Exception as e:
+        print(f"❌ Erro ao juntar os segmentos de áudio: {e}")
+        return answer, None
+    return answer, audio_path
+
+@traced()
+def upload_to_cloudinary(audio_path, audio_digest=None):
+    cloudinary = get_cloudinary()
+    media_store = get_media_store()
+    try:
+        audio_digest = audio_digest or file_digest(audio_path)
+        cached_url = media_store.get_text("uploads", audio_digest)
+        if cached_url:
+            return cached_url
+
         response = cloudinary.uploader.upload(audio_path, resource_type="video")
-        return response.get("secure_url")
+        public_url = response.get("secure_url")
+        if public_url:
+            media_store.put_text("uploads", audio_digest, public_url)
+        return public_url
     except cloudinary.exceptions.Error as e:
         print(f"❌ Erro do Cloudinary: {e}")
     except Exception as e:
@@ -199,39 +551,35 @@ def upload_to_cloudinary(audio_path):
         traceback.print_exc()
     return None
 
-def generate_video_with_avatar(audio_url):
-    print("🎥 Gerando vídeo animado com fala sincronizada...")
+@traced()
+def generate_video_with_avatar(audio_url, audio_digest=None):
+    import requests
 
+    replicate = get_replicate()
+    media_store = get_media_store()
     try:
+        video_key = content_key(SADTALKER_MODEL, SADTALKER_PARAMS, SADTALKER_IMAGE_URL, audio_digest or audio_url)
+        cached_path = media_store.get("video", video_key, "mp4")
+        if cached_path:
+            print("🎥 Vídeo já gerado para este áudio, reaproveitando...")
+            return cached_path
+
+        print("🎥 Gerando vídeo animado com fala sincronizada...")
         output_url = replicate.run(
-            "cjwbw/sadtalker:a519cc0cfebaaeade068b23899165a11ec76aaa1d2b313d40d214f204ec957a3",
+            SADTALKER_MODEL,
             input={
-                "facerender": "facevid2vid",
-                "pose_style": 0,
-                "preprocess": "crop",
-                "still_mode": True,
+                **SADTALKER_PARAMS,
                 "driven_audio": audio_url,
                 "source_image": SADTALKER_IMAGE_URL,
-                "use_enhancer": True,
-                "use_eyeblink": True,
-                "size_of_image": 256,
-                "expression_scale": 1
             }
         )
+        persistence.add_cost("video", persistence.SADTALKER_COST_PER_CALL)
 
         if not output_url:
             print("⚠️ Falha ao gerar o vídeo: saída vazia.")
             return None
 
-        video_id = str(uuid.uuid4())
-        video_path = f"static/video/{video_id}.mp4"
-
-        os.makedirs("static/video", exist_ok=True)
-        video_data = requests.get(output_url).content
-        with open(video_path, "wb") as f:
-            f.write(video_data)
-
-        return video_path
+        return media_store.download(output_url, "video", video_key, "mp4")
 
     except requests.exceptions.RequestException as e:
         print(f"❌ Erro de rede ao baixar o vídeo: {e}")
@@ -250,46 +598,59 @@ def main():
         question = input("🪙 What do you want to ask about the crypto world? (type 'exit' to quit)\n👉 ").strip()
 
         if question.lower() == "exit":
+            stats = router.stats()
+            print(f"🧭 Local routing hit rate: {stats['hit_rate']:.0%} ({stats['cache_hits']} cache, {stats['rule_hits']} rules, {stats['lookups']} lookups)")
+            for kind, entry in attempt_stats().items():
+                print(f"⏱️ {kind}: {entry['count']} attempt(s), {entry['ok']} ok, {entry['avg_seconds']:.2f}s avg")
+            print(f"\n📊 Stage latencies (s):\n{tracer.report()}")
+            print(f"💾 Trace saved to {tracer.export_json()}")
             print("👋 See you next time! Happy investing!")
             break
 
-        start_time = time.time()
-        print("\n🔍 Querying CoinGecko with DeepSeek help...\n")
-        coin_data = get_data(question)
-
-        if coin_data:
-            print("\n💬 Generating personalized response:\n")
-            final_answer_with_emojis = query_deepseek_stream(build_final_prompt(question, coin_data))
-            final_answer_clean = remove_emojis(final_answer_with_emojis)
-
-            print(f"🧪 Texto enviado para TTS: {final_answer_clean}")
-            audio_path = save_audio_from_replicate(final_answer_clean)
-
-            if audio_path:
-                public_url = upload_to_cloudinary(audio_path)
-
-                if public_url:
-                    video_path = generate_video_with_avatar(public_url)
-                    total_time = time.time() - start_time
-
-                    print(final_answer_with_emojis)
-                    print(f"\n🔊 Áudio salvo localmente em: {audio_path}")
-                    print(f"🌐 URL pública do áudio: {public_url}")
-
-                    if video_path:
-                        print(f"🎬 Vídeo gerado e salvo em: {video_path}")
-                        print(f"\n⏱️ Tempo total de processamento: {total_time:.2f} segundos")
+        consulta = persistence.start_consulta(question)
+        try:
+            with persistence.activate(consulta):
+                start_time = time.time()
+                print("\n🔍 Querying CoinGecko with DeepSeek help...\n")
+                with persistence.stage("data"):
+                    coin_data = get_data(question)
+
+                if coin_data:
+                    print("\n💬 Generating personalized response:\n")
+                    with persistence.stage("answer"):
+                        final_answer_with_emojis, audio_path = save_audio_streaming(build_final_prompt(question, coin_data))
+                    consulta.answer = final_answer_with_emojis
+
+                    if audio_path:
+                        audio_digest = file_digest(audio_path)
+                        with persistence.stage("upload"):
+                            public_url = upload_to_cloudinary(audio_path, audio_digest)
+
+                        if public_url:
+                            with persistence.stage("video"):
+                                video_path = generate_video_with_avatar(public_url, audio_digest)
+                            total_time = time.time() - start_time
+
+                            print(final_answer_with_emojis)
+                            print(f"\n🔊 Áudio salvo localmente em: {audio_path}")
+                            print(f"🌐 URL pública do áudio: {public_url}")
+
+                            if video_path:
+                                print(f"🎬 Vídeo gerado e salvo em: {video_path}")
+                                print(f"\n⏱️ Tempo total de processamento: {total_time:.2f} segundos")
+                            else:
+                                print("⚠️ Falha ao gerar o vídeo animado.")
+                        else:
+                            print("⚠️ Não foi possível gerar a URL pública do áudio.")
                     else:
-                        print("⚠️ Falha ao gerar o vídeo animado.")
-                else:
-                    print("⚠️ Não foi possível gerar a URL pública do áudio.")
-            else:
-                print("😕 Falha ao gerar áudio. Texto final gerado:")
-                print(final_answer_with_emojis)
+                        print("😕 Falha ao gerar áudio. Texto final gerado:")
+                        print(final_answer_with_emojis)
 
-            print("\n✅ All done!\n")
-        else:
-            print("\n😢 Couldn't get the info this time. Try another question!\n")
+                    print("\n✅ All done!\n")
+                else:
+                    print("\n😢 Couldn't get the info this time. Try another question!\n")
+        finally:
+            persistence.finish_consulta(consulta)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,192 @@
+import time
+
+# ⏱️ Marcado antes dos imports: o tempo de subida inclui carregar o pipeline
+STARTED = time.perf_counter()
+
+import argparse
+import json
+import os
+import threading
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import persistence
+import run
+from jobs import JobQueue
+from tracing import tracer
+
+SERVICE_HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", "8000"))
+SERVICE_WARMUP = os.getenv("SERVICE_WARMUP", "1") == "1"
+SERVICE_MAX_WAIT = float(os.getenv("SERVICE_MAX_WAIT", "300"))
+
+
+class Service:
+    def __init__(self, jobs=None):
+        self.jobs = jobs or JobQueue(self.render_media)
+        self.startup_seconds = None
+        self.warmup_seconds = None
+
+    def ask(self, question):
+        # Só o texto fica no caminho da requisição; áudio e vídeo vão para a fila de jobs
+        started = time.time()
+        consulta = persistence.start_consulta(question)
+        queued = False
+        try:
+            with persistence.activate(consulta), tracer.span("service.ask"):
+                with persistence.stage("data"):
+                    coin_data = run.get_data(question)
+                if not coin_data:
+                    return None
+                with persistence.stage("answer"):
+                    answer = run.query_deepseek_stream(run.build_final_prompt(question, coin_data))
+            # Sem texto não há o que narrar: nem vale enfileirar um job fadado a falhar
+            if not answer:
+                return None
+
+            time_to_text = time.time() - started
+            tracer.record("service.time_to_text", time_to_text)
+            consulta.answer = answer
+            job = self.jobs.submit({"question": question, "answer": answer}, consulta)
+            queued = True
+            return {"answer": answer, "job_id": job["id"], "time_to_text": round(time_to_text, 3)}
+        finally:
+            # Com job na fila, quem registra a consulta é o job (com os custos de áudio e vídeo)
+            if not queued:
+                persistence.finish_consulta(consulta)
+
+    def render_media(self, job, consulta, update):
+        question, answer = job["payload"]["question"], job["payload"]["answer"]
+        # Depois de um restart a consulta original se perdeu: os custos vão para uma nova
+        consulta = consulta or persistence.start_consulta(question)
+        try:
+            with persistence.activate(consulta):
+                update(stage="audio")
+                with persistence.stage("audio"):
+                    _, audio_path = run.synthesize_audio([answer])
+                if not audio_path:
+                    raise RuntimeError("Audio generation failed")
+
+                update(stage="upload", result={"audio_path": audio_path})
+                audio_digest = run.file_digest(audio_path)
+                with persistence.stage("upload"):
+                    public_url = run.upload_to_cloudinary(audio_path, audio_digest)
+                if not public_url:
+                    raise RuntimeError("Audio upload failed")
+
+                update(stage="video", result={"audio_url": public_url})
+                with persistence.stage("video"):
+                    video_path = run.generate_video_with_avatar(public_url, audio_digest)
+                if not video_path:
+                    raise RuntimeError("Video generation failed")
+                return {"video_path": video_path}
+        finally:
+            persistence.finish_consulta(consulta, answer)
+
+    def warm_up(self):
+        self.warmup_seconds = run.warm_up()
+        print(f"🔥 Clients warmed up in {self.warmup_seconds:.2f}s")
+
+    def stats(self):
+        return {
+            "startup_seconds": self.startup_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "jobs": self.jobs.store.counts(),
+            "router": run.router.stats(),
+            "stages": tracer.snapshot(include_spans=False)["histograms"],
+        }
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    service = None
+
+    def do_POST(self):
+        if urlsplit(self.path).path != "/ask":
+            return self._send_json({"error": "not found"}, 404)
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            question = str(body.get("question", "")).strip()
+        except (ValueError, AttributeError):
+            return self._send_json({"error": "invalid JSON body"}, 400)
+        if not question:
+            return self._send_json({"error": "missing question"}, 400)
+
+        try:
+            result = self.service.ask(question)
+        except Exception as e:
+            print(f"❌ Erro ao responder '{question}': {e}")
+            traceback.print_exc()
+            return self._send_json({"error": "internal error"}, 500)
+        if result is None:
+            return self._send_json({"error": "Couldn't get the info this time"}, 502)
+        self._send_json({**result, "job_url": f"/jobs/{result['job_id']}"})
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        params = {key: values[0] for key, values in parse_qs(parts.query).items()}
+
+        if parts.path == "/health":
+            return self._send_json({"status": "ok", "startup_seconds": self.service.startup_seconds})
+        if parts.path == "/stats":
+            return self._send_json(self.service.stats())
+        if parts.path.startswith("/jobs/"):
+            job_id = parts.path[len("/jobs/"):]
+            try:
+                wait = min(float(params.get("wait", "0")), SERVICE_MAX_WAIT)
+            except ValueError:
+                return self._send_json({"error": "invalid wait"}, 400)
+            store = self.service.jobs.store
+            job = store.wait(job_id, wait) if wait > 0 else store.get(job_id)
+            if job is None:
+                return self._send_json({"error": "job not found"}, 404)
+            return self._send_json(job)
+        self._send_json({"error": "not found"}, 404)
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        print(f"🌐 {self.address_string()} {format % args}")
+
+
+def create_server(service, host=SERVICE_HOST, port=SERVICE_PORT):
+    handler = type("Handler", (ServiceHandler,), {"service": service})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-running crypto consultant: text now, audio/video as background jobs.")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--no-warmup", action="store_true", help="don't import/connect the clients before the first question")
+    args = parser.parse_args()
+
+    service = Service()
+    server = create_server(service, args.host, args.port)
+    service.startup_seconds = round(time.perf_counter() - STARTED, 3)
+    print(f"🚀 Serving on http://{args.host}:{server.server_port} (ready in {service.startup_seconds:.2f}s)")
+
+    # O aquecimento roda em paralelo: o servidor já aceita conexões enquanto isso
+    if SERVICE_WARMUP and not args.no_warmup:
+        threading.Thread(target=service.warm_up, name="warm-up", daemon=True).start()
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"\n📊 Stage latencies (s):\n{tracer.report()}")
+        print(f"💾 Trace saved to {tracer.export_json()}")
+        print("👋 Service stopped. Unfinished jobs resume on the next start.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import re
+import wave
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+SENTENCE_END = re.compile(r"(?<=[.!?…])[\"')\]]*\s+|\n\s*\n")
+MIN_SENTENCE_CHARS = 40
+
+
+def _partial_tag_length(text, tag):
+    # Quantos caracteres do fim de `text` podem ser o começo de `tag`
+    for size in range(min(len(tag) - 1, len(text)), 0, -1):
+        if text.endswith(tag[:size]):
+            return size
+    return 0
+
+
+class ThinkFilter:
+    def __init__(self):
+        self.in_think = False
+        self._pending = ""
+
+    def feed(self, chunk):
+        text = self._pending + chunk
+        self._pending = ""
+        visible = []
+
+        while text:
+            tag = THINK_CLOSE if self.in_think else THINK_OPEN
+            index = text.find(tag)
+            if index >= 0:
+                if not self.in_think:
+                    visible.append(text[:index])
+                text = text[index + len(tag):]
+                self.in_think = not self.in_think
+                continue
+
+            keep = _partial_tag_length(text, tag)
+            if not self.in_think:
+                visible.append(text[:len(text) - keep])
+            self._pending = text[len(text) - keep:] if keep else ""
+            break
+
+        return "".join(visible)
+
+    def flush(self):
+        pending, self._pending = self._pending, ""
+        return "" if self.in_think else pending
+
+
+class SentenceSplitter:
+    def __init__(self, min_chars=MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self._buffer = ""
+        self._emitted_any = False
+
+    def feed(self, text):
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in SENTENCE_END.finditer(self._buffer):
+            candidate = self._buffer[start:match.end()]
+            # A primeira frase sai o quanto antes; as outras são agrupadas até um tamanho mínimo
+            if self._emitted_any and len(candidate.strip()) < self.min_chars:
+                continue
+            if candidate.strip():
+                sentences.append(candidate.strip())
+                self._emitted_any = True
+            start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self):
+        rest, self._buffer = self._buffer.strip(), ""
+        return [rest] if rest else []
+
+
+def stitch_wavs(paths, output_path):
+    with wave.open(paths[0], "rb") as first:
+        params = first.getparams()
+
+    with wave.open(output_path, "wb") as out:
+        out.setparams(params)
+        for path in paths:
+            with wave.open(path, "rb") as segment:
+                if segment.getparams()[:3] != params[:3]:
+                    raise wave.Error(f"Incompatible WAV segment: {path}")
+                out.writeframes(segment.readframes(segment.getnframes()))
+    return output_path
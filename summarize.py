@@ -0,0 +1,194 @@
+import json
+import re
+from datetime import datetime, timezone
+
+import numpy as np
+
+DOWNSAMPLE_POINTS = 12
+MARKETS_LIMIT = 20
+MARKETS_MAX_LIMIT = 250
+MARKETS_FIELDS = [
+    "market_cap_rank", "name", "symbol", "current_price", "market_cap",
+    "total_volume", "high_24h", "low_24h", "price_change_percentage_24h",
+]
+SERIES_KEYS = ["prices", "market_caps", "total_volumes"]
+
+# 📐 Métricas pedidas pela pergunta; sem pista nenhuma, vai o resumo padrão
+METRIC_WORDS = {
+    "mean": r"\b(average|avg|mean|média|media)\b",
+    "range": r"\b(highs?|highest|peaks?|lows?|lowest|max|min|máxima|maxima|mínima|minima|range)\b",
+    "return": r"\b(change|changed|return|returns|performance|gain|gains|loss|up|down|variação|variacao)\b",
+    "volatility": r"\b(volatility|volatile|risk|swing|swings|volatilidade)\b",
+    "drawdown": r"\b(drawdown|crash|dip|drop|fell|fall|queda)\b",
+    "points": r"\b(chart|trend|history|historical|over time|evolution|histórico|historico|tendência|tendencia)\b",
+}
+DEFAULT_METRICS = {"mean", "range", "return", "points"}
+
+
+def select_metrics(question):
+    text = question.lower()
+    metrics = {name for name, pattern in METRIC_WORDS.items() if re.search(pattern, text)}
+    return metrics or set(DEFAULT_METRICS)
+
+
+def series_to_array(pairs):
+    try:
+        array = np.asarray(pairs, dtype=np.float64)
+    except (TypeError, ValueError):
+        return None
+    if array.ndim != 2 or array.shape[0] == 0 or array.shape[1] < 2:
+        return None
+    return array[np.isfinite(array).all(axis=1)]
+
+
+def _date(ms):
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).strftime("%Y-%m-%d %H:%M")
+
+
+def _number(value):
+    if abs(value) >= 1000:
+        return f"{value:,.0f}"
+    if abs(value) >= 1:
+        return f"{value:,.2f}"
+    return f"{value:.6g}"
+
+
+def summarize_series(array, metrics, points=DOWNSAMPLE_POINTS):
+    timestamps, values = array[:, 0], array[:, 1]
+    summary = {
+        "points": len(values),
+        "start": (_date(timestamps[0]), values[0]),
+        "end": (_date(timestamps[-1]), values[-1]),
+    }
+
+    if "mean" in metrics:
+        summary["mean"] = float(values.mean())
+        summary["median"] = float(np.median(values))
+
+    if "range" in metrics:
+        low, high = int(values.argmin()), int(values.argmax())
+        summary["min"] = (_date(timestamps[low]), values[low])
+        summary["max"] = (_date(timestamps[high]), values[high])
+
+    if "return" in metrics and values[0]:
+        summary["return_pct"] = float((values[-1] / values[0] - 1) * 100)
+
+    step_ms = float(np.median(np.diff(timestamps))) if len(values) > 2 else 0
+    if "volatility" in metrics and step_ms > 0 and (values > 0).all():
+        log_returns = np.diff(np.log(values))
+        steps_per_day = 86_400_000 / step_ms
+        daily = float(log_returns.std(ddof=1) * np.sqrt(steps_per_day))
+        summary["volatility_daily_pct"] = daily * 100
+        summary["volatility_annual_pct"] = daily * np.sqrt(365) * 100
+
+    if "drawdown" in metrics:
+        running_max = np.maximum.accumulate(values)
+        drawdowns = values / running_max - 1
+        trough = int(drawdowns.argmin())
+        peak = int(values[:trough + 1].argmax())
+        summary["max_drawdown_pct"] = float(drawdowns[trough] * 100)
+        summary["drawdown_period"] = (_date(timestamps[peak]), _date(timestamps[trough]))
+
+    if "points" in metrics and len(values) > points:
+        # Média por balde: cada ponto resume um trecho do período, não só uma amostra
+        buckets = np.array_split(np.arange(len(values)), points)
+        summary["downsampled"] = [(_date(timestamps[b[-1]]), float(values[b].mean())) for b in buckets]
+    elif "points" in metrics:
+        summary["downsampled"] = [(_date(t), float(v)) for t, v in zip(timestamps, values)]
+
+    return summary
+
+
+def format_series(name, summary):
+    lines = [f"{name} ({summary['points']} points, {summary['start'][0]} -> {summary['end'][0]} UTC)", "metric | value"]
+    lines.append(f"start | {_number(summary['start'][1])}")
+    lines.append(f"end | {_number(summary['end'][1])}")
+    if "mean" in summary:
+        lines.append(f"mean | {_number(summary['mean'])}")
+        lines.append(f"median | {_number(summary['median'])}")
+    if "min" in summary:
+        lines.append(f"min | {_number(summary['min'][1])} on {summary['min'][0]}")
+        lines.append(f"max | {_number(summary['max'][1])} on {summary['max'][0]}")
+    if "return_pct" in summary:
+        lines.append(f"change | {summary['return_pct']:+.2f}%")
+    if "volatility_daily_pct" in summary:
+        lines.append(f"volatility | {summary['volatility_daily_pct']:.2f}% daily, {summary['volatility_annual_pct']:.1f}% annualized")
+    if "max_drawdown_pct" in summary:
+        peak, trough = summary["drawdown_period"]
+        lines.append(f"max drawdown | {summary['max_drawdown_pct']:.2f}% ({peak} -> {trough})")
+    if summary.get("downsampled"):
+        lines.append("date | value")
+        lines.extend(f"{date} | {_number(value)}" for date, value in summary["downsampled"])
+    return "\n".join(lines)
+
+
+def summarize_ohlc(rows, metrics):
+    array = series_to_array(rows)
+    if array is None or array.shape[1] < 5:
+        return None
+    timestamps, opens, highs, lows, closes = array[:, :5].T
+    high, low = int(highs.argmax()), int(lows.argmin())
+
+    summary = summarize_series(np.column_stack([timestamps, closes]), metrics - {"range"})
+    downsampled = summary.pop("downsampled", None)
+    lines = [format_series("close", summary)]
+    lines.append(f"open | {_number(opens[0])}")
+    lines.append(f"high | {_number(highs[high])} on {_date(timestamps[high])}")
+    lines.append(f"low | {_number(lows[low])} on {_date(timestamps[low])}")
+    if downsampled:
+        lines.append("date | close")
+        lines.extend(f"{date} | {_number(value)}" for date, value in downsampled)
+    return "\n".join(lines)
+
+
+def _compact_json(data):
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+def markets_limit(question):
+    match = re.search(r"\btop\s+(\d+)\b", question.lower())
+    return min(max(1, int(match.group(1))), MARKETS_MAX_LIMIT) if match else MARKETS_LIMIT
+
+
+def summarize_markets(question, data):
+    # "top N" define o corte; moedas citadas na pergunta entram mesmo fora dele ("qual o rank da X?")
+    limit = markets_limit(question)
+    text = question.lower()
+    rows = []
+    for index, coin in enumerate(data):
+        names = [str(coin.get(key) or "").lower() for key in ("id", "name", "symbol")]
+        mentioned = any(len(name) >= 3 and re.search(rf"\b{re.escape(name)}\b", text) for name in names)
+        if index < limit or mentioned:
+            rows.append({field: coin.get(field) for field in MARKETS_FIELDS})
+
+    table = _compact_json(rows)
+    if len(rows) < len(data):
+        # O modelo precisa saber que a lista foi cortada, senão "não está na lista" vira "não existe"
+        return f"(showing {len(rows)} of {len(data)} coins, ordered by market_cap_rank; the rest were omitted)\n{table}"
+    return table
+
+
+def summarize_payload(question, data):
+    metrics = select_metrics(question)
+
+    if isinstance(data, dict) and any(key in data for key in SERIES_KEYS):
+        sections = []
+        for key in SERIES_KEYS:
+            array = series_to_array(data.get(key) or [])
+            if array is None or not len(array):
+                continue
+            # Market cap e volume só entram com o resumo básico; o foco é o preço
+            series_metrics = metrics if key == "prices" else metrics & {"mean", "range", "return"}
+            sections.append(format_series(key, summarize_series(array, series_metrics)))
+        if sections:
+            return "\n\n".join(sections)
+
+    if isinstance(data, list) and data and isinstance(data[0], list):
+        table = summarize_ohlc(data, metrics)
+        if table:
+            return table
+
+    if isinstance(data, list) and data and isinstance(data[0], dict) and "market_cap_rank" in data[0]:
+        return summarize_markets(question, data)
+
+    return _compact_json(data)
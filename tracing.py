@@ -0,0 +1,187 @@
+import contextvars
+import functools
+import inspect
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "cache/trace.json")
+HISTOGRAM_MAX_SAMPLES = 10_000
+RECENT_SPANS = 1_000
+
+_parent = contextvars.ContextVar("span", default=None)
+
+
+class Histogram:
+    def __init__(self, max_samples=HISTOGRAM_MAX_SAMPLES):
+        self.max_samples = max_samples
+        self.samples = []
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.errors = 0
+
+    def add(self, seconds, error=False):
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+        self.errors += error
+        # Reservoir sampling: memória fixa, percentis ainda representativos
+        if len(self.samples) < self.max_samples:
+            self.samples.append(seconds)
+        else:
+            index = random.randrange(self.count)
+            if index < self.max_samples:
+                self.samples[index] = seconds
+
+    def percentile(self, pct):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+class Tracer:
+    def __init__(self):
+        self.histograms = {}
+        self.spans = deque(maxlen=RECENT_SPANS)
+        self._lock = threading.Lock()
+        self._ids = 0
+
+    def record(self, name, seconds, error=False):
+        with self._lock:
+            self.histograms.setdefault(name, Histogram()).add(seconds, error)
+
+    def next_id(self):
+        with self._lock:
+            self._ids += 1
+            return self._ids
+
+    def finish(self, span_id, parent, name, started, error=None, **attributes):
+        seconds = time.time() - started
+        self.record(name, seconds, error is not None)
+        self.spans.append({
+            "id": span_id,
+            "parent": parent,
+            "name": name,
+            "start": round(started, 6),
+            "seconds": round(seconds, 6),
+            "thread": threading.current_thread().name,
+            "error": error,
+            **attributes,
+        })
+
+    @contextmanager
+    def span(self, name, **attributes):
+        span_id = self.next_id()
+        parent = _parent.get()
+        token = _parent.set(span_id)
+        started = time.time()
+        error = None
+        try:
+            yield attributes
+        except BaseException as e:
+            error = repr(e)
+            raise
+        finally:
+            _parent.reset(token)
+            self.finish(span_id, parent, name, started, error, **attributes)
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.spans.clear()
+
+    def snapshot(self, include_spans=True):
+        with self._lock:
+            data = {"histograms": {name: histogram.summary() for name, histogram in sorted(self.histograms.items())}}
+            if include_spans:
+                data["spans"] = list(self.spans)
+        return data
+
+    def export_json(self, path=TRACE_EXPORT_PATH, include_spans=True):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(include_spans), f, indent=2)
+        return path
+
+    def report(self):
+        lines = [f"{'stage':<32} {'count':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}"]
+        for name, stats in self.snapshot(include_spans=False)["histograms"].items():
+            lines.append(
+                f"{name:<32} {stats['count']:>6} {stats['p50']:>8.3f} {stats['p95']:>8.3f} {stats['p99']:>8.3f} {stats['max']:>8.3f}"
+            )
+        return "\n".join(lines)
+
+
+tracer = Tracer()
+
+
+def traced(name=None):
+    def decorator(fn):
+        span_name = name or fn.__name__
+
+        if inspect.isgeneratorfunction(fn):
+            # Em streams, o que importa é o tempo até o primeiro pedaço e até o fim.
+            # O span só é o pai enquanto o gerador produz um pedaço: suspenso, não vaza para quem consome
+            @functools.wraps(fn)
+            def generator_wrapper(*args, **kwargs):
+                span_id = tracer.next_id()
+                parent = _parent.get()
+                started = time.time()
+                error = None
+                first = True
+                chunks = fn(*args, **kwargs)
+                try:
+                    while True:
+                        token = _parent.set(span_id)
+                        try:
+                            chunk = next(chunks)
+                        except StopIteration:
+                            break
+                        finally:
+                            _parent.reset(token)
+                        if first:
+                            tracer.record(f"{span_name}.first_chunk", time.time() - started)
+                            first = False
+                        yield chunk
+                except GeneratorExit:
+                    # Consumidor parou de ler: não é erro do estágio
+                    raise
+                except BaseException as e:
+                    error = repr(e)
+                    raise
+                finally:
+                    chunks.close()
+                    tracer.finish(span_id, parent, span_name, started, error)
+
+            return generator_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with tracer.span(span_name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator